@@ -0,0 +1 @@
+"""Conveyor controller HMI for the DOBOT Magician and Mini Conveyor."""
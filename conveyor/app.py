@@ -0,0 +1,763 @@
+import argparse
+import asyncio
+import configparser
+import os
+import sys
+import threading
+import time
+
+# Startup is reported from here: importing pygame is a good part of it
+IMPORT_STARTED = time.perf_counter()
+
+import pygame
+
+from .assets import AssetManager
+from .control_core import ControlCore
+from .counting import BlockCounter
+from .frame_scheduler import FrameScheduler
+from .hardware import BACKENDS, create_backend
+from .instrumentation import instruments
+from .metrics import MetricsEngine
+from .motion_planner import STEP_SEQUENCES, plan_move
+from .pallets import BlockColor, Pallet
+from . import production_log as plog
+from .processes import ProcessGroup
+from .renderer import Renderer
+from .self_test import format_results, run_self_test
+from .shared_state import MOTOR_STATES, SharedState
+from .stepper import StepperEngine
+from .telemetry_server import TelemetryServer
+from .text_cache import text_cache
+from .widgets import Button, CircleButton, Console, ProfilerOverlay
+
+# Background images sit next to main.py
+ASSET_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+assigned_color = (0,0,0)
+output_pin = 11
+stepper_pin = 17
+TARGET_FPS = 30  # Frame budget while the conveyor is running or being used
+IDLE_FPS = 2     # Redraw rate once stopped with no input
+LOG_PATH = os.path.join(ASSET_DIR, "production.bin")  # Counts and run time survive restarts through this
+COLOR_LUT_PATH = os.path.join(ASSET_DIR, "color_lut.npy")  # Camera color table, built on first use and rebuilt when the colors or thresholds change
+ASSET_CACHE_DIR = os.path.join(ASSET_DIR, ".asset-cache")  # Backgrounds as raw pixels, quicker to load than the PNGs; safe to delete
+PROFILE_DIR = ASSET_DIR  # F4 captures land here as profile-*.prof and trace-*.json
+CONFIG_PATH = os.path.join(ASSET_DIR, "conveyor.ini")  # Read if present; command line options win
+JOG_SETTLE = 0.05  # Seconds between stopping the line and jogging it
+
+# Control loop tasks: (period, time budget) in seconds. The render period
+# follows TARGET_FPS/IDLE_FPS. While the line is idle (see line_idle) input
+# blocks in pygame.event.wait and motor, sensor and telemetry are parked.
+INPUT_PERIOD, INPUT_BUDGET = 0.01, 0.004
+RENDER_BUDGET = 0.020
+MOTOR_PERIOD, MOTOR_BUDGET = 0.02, 0.002
+SENSOR_PERIOD, SENSOR_BUDGET = 0.05, 0.003
+TELEMETRY_PERIOD, TELEMETRY_BUDGET = 1.0, 0.005
+PROCESS_PERIOD, PROCESS_BUDGET = 0.5, 0.002  # --processes: child liveness
+
+# Color code per slot, filled by the sensor; layers and slots per layer
+PALLET_LAYERS = 3
+PALLET_SLOTS = 9
+pallet = Pallet(PALLET_LAYERS, PALLET_SLOTS)
+
+# Integer codes, in the order of every per-color count (shared state, production log)
+block_colors = tuple(BlockColor)
+
+# ==============================================
+#          Start of Button Functions
+# ==============================================
+
+# Run flag, run timer and counts live in `state` (a SharedState), so other
+# processes can read them; this thread is the only writer of state.line.
+#
+# The button functions are async commands: the UI submits them to the
+# control core, which runs them one at a time on its event loop. None of
+# them wait except jog(), so synchronous drivers can use control_core.run_sync.
+
+core = None
+frame_scheduler = None
+telemetry = None
+
+def command(function, *args):
+    """A button callback that submits `function` to the control core."""
+    return lambda: core.submit(function, *args)
+
+async def start():
+    global assigned_color,output_pin
+    if not state.line.running:
+        GPIO.output(output_pin, GPIO.HIGH)
+        production_log.append(plog.START)
+        sensor.set_running(True)
+        metrics.set_running(True)
+        assigned_color = (15, 180, 30)
+        state.update_line(running=True)
+
+async def stop():
+    global assigned_color,output_pin
+    stepper.stop()
+    if state.line.running:
+        assigned_color = (255, 40, 50)
+        GPIO.output(output_pin, GPIO.LOW)
+        production_log.append(plog.STOP)
+        sensor.set_running(False)
+        metrics.set_running(False)
+        state.update_line(running=False)
+
+async def rst_count():
+    counter.reset_colors()
+    production_log.append(plog.RESET_COUNT)
+
+async def jog_conveyor():
+    if state.line.running:
+        print("PROGRAM IS STARTED. STOP THE PROGRAM TO JOG CONVEYOR.")
+    profiled_jog(100)
+    production_log.append(plog.JOG, value=100 * len(step_sequence))
+    GPIO.output(stepper_pin, GPIO.HIGH)
+
+async def start_run():
+    """START button: starts the run timer and the line."""
+    start_button.clicked = True
+    state.update_line(start_time=time.time() - state.line.elapsed)
+    await start()
+
+def pause_timer():
+    if start_button.clicked:
+        state.update_line(elapsed=time.time() - state.line.start_time)
+        start_button.clicked = False
+
+async def stop_run():
+    """STOP button: pauses the run timer and stops the line."""
+    pause_timer()
+    await stop()
+
+async def jog():
+    """JOG button: stops the line, lets the belt settle, then jogs."""
+    await stop_run()
+    await asyncio.sleep(JOG_SETTLE)
+    await jog_conveyor()
+
+def format_metrics(line):
+    rates = ", ".join("{}m {:.1f}".format(minutes, rate) for minutes, rate in line.rates.items())
+    cycles = ", ".join("{} {}".format(color, "-" if cycle is None else "{:.1f}s".format(cycle)) for color, cycle in line.cycle_times.items())
+    return "blocks/min {}; cycle {}; utilization {:.0%}".format(rates, cycles, line.utilization)
+
+def toggle_profile():
+    """F4: starts a cProfile capture, or stops it and writes the .prof plus a trace of the recent samples."""
+    if not instruments.profiling:
+        instruments.start_profile()
+        print("Profiling the UI thread, press F4 again to stop")
+        return
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    profile = instruments.stop_profile(os.path.join(PROFILE_DIR, "profile-" + stamp + ".prof"))
+    trace = os.path.join(PROFILE_DIR, "trace-" + stamp + ".json")
+    print("Wrote {} and {} ({} samples)".format(profile, trace, instruments.dump_trace(trace)))
+
+def shutdown():
+    """Releases everything setup_hardware() took; main() calls it however the loop ended."""
+    if instruments.profiling:
+        toggle_profile()
+    if frame_scheduler is not None:
+        print("Frame stats: " + frame_scheduler.summary())
+    if core is not None:
+        print("Tasks: " + core.summary())
+    if telemetry is not None:
+        telemetry.close()
+        print("Telemetry: " + telemetry.summary())
+    print("Text cache: " + text_cache.summary())
+    print("Line: " + format_metrics(metrics.snapshot()))
+    sensor.close()
+    stepper.shutdown()
+    production_log.close()
+    state.close()
+    GPIO.cleanup()
+    pygame.quit()
+
+def stop_program():
+    """Ends the control loop; main() shuts down and exits."""
+    core.stop()
+
+def update_elapsed():
+    global start_button
+
+    if start_button.clicked:
+        state.update_line(elapsed=time.time() - state.line.start_time)
+
+def get_elapsed_time():
+    """Returns the elapsed time as a formatted string."""
+    update_elapsed()
+    return "{:.2f}".format(state.line.elapsed)
+
+async def rst_time():
+    state.update_line(start_time=0.0, elapsed=0.0)
+    production_log.append(plog.RESET_TIME)
+
+async def rst_total():
+    counter.reset_total()
+    production_log.append(plog.RESET_TOTAL)
+
+# ==============================================
+#               START OF CONSOLE
+# ==============================================
+
+def update_color_blocks(colored_block_list):
+    global color_blocks
+    red_blocks = colored_block_list[BlockColor.RED]
+    blue_blocks = colored_block_list[BlockColor.BLUE]
+    green_blocks = colored_block_list[BlockColor.GREEN]
+    yellow_blocks = colored_block_list[BlockColor.YELLOW]
+    color_blocks.set_field("red", red_blocks, "Red Blocks: {}")
+    color_blocks.set_field("blue", blue_blocks, "Blue Blocks: {}")
+    color_blocks.set_field("green", green_blocks, "Green Blocks: {}")
+    color_blocks.set_field("yellow", yellow_blocks, "Yellow Blocks: {}")
+
+def update_stats(timer):
+    global block_stats
+    line = metrics.snapshot()
+    block_stats.set_field("run_time", timer, "Total Run Time: {}")
+    block_stats.set_field("rate", (round(line.rates[1]), round(100 * line.utilization)), "Rate: {0[0]}/min  Util: {0[1]}%")
+    block_stats.set_field("part_count", state.line.total, "Total Part Count: {}")
+
+# ==============================================
+#            START OF MOTOR CONTROL
+# ==============================================
+
+# Define GPIO pins connected to L293D
+IN1 = 28  # GPIO28
+IN2 = 23  # GPIO23
+IN3 = 27  # GPIO27
+IN4 = 22  # GPIO22
+
+# Coil sequence for bipolar stepper: "full", "half" or "wave"
+STEP_MODE = "full"
+step_sequence = STEP_SEQUENCES[STEP_MODE]
+
+# Jog motion profile, speeds in sequence entries per second
+MOTION_PROFILE = "scurve"  # "scurve" or "trapezoid"
+START_SPEED = 100.0
+MAX_SPEED = 300.0
+ACCELERATION = 1500.0
+JERK = 15000.0
+
+# How coil states reach the pins on the Pi: "list" (RPi.GPIO, one call per
+# step) or "mmap" (direct register writes through /dev/gpiomem)
+COIL_BACKEND = "list"
+
+def log_block(event):
+    # Counter timestamps are monotonic; the log wants wall clock time
+    production_log.append(plog.BLOCK, code=event.color, timestamp=event.timestamp + clock_offset)
+
+def setup_hardware(backend, shared, processes=None, clock=time, log_path=LOG_PATH):
+    """
+    processes is a ProcessGroup, or anything else that brings its own
+    `stepper` and `sensor` (the simulation passes virtual ones); the coils
+    and the sensor then belong to it and this process keeps the UI, counting
+    and the log. clock provides monotonic() and time(), the time module
+    unless a simulation is driving a virtual clock.
+    """
+    global hw, GPIO, coils, stepper, sensor, process_group, counter, metrics, production_log, clock_offset, state
+    hw = backend
+    state = shared
+    GPIO = hw.gpio
+    process_group = processes
+
+    # Setup
+    GPIO.setmode(GPIO.BCM)
+    for pin in (output_pin, stepper_pin):
+        GPIO.setup(pin, GPIO.OUT)
+
+    if processes is None:
+        for pin in (IN1, IN2, IN3, IN4):
+            GPIO.setup(pin, GPIO.OUT)
+        coils = hw.create_coils([IN1, IN2, IN3, IN4])
+        # Steps the motor on its own thread; the UI only queues commands
+        stepper = StepperEngine(coils.write, coils.compile(step_sequence), delay=0.01).start()
+        stepper.late_samples = instruments.probe("stepper_late")
+        sensor = hw.sensor
+    else:
+        coils = None
+        stepper = processes.stepper
+        sensor = processes.sensor
+
+    # Detections arrive from the sensor thread; the loop reads one snapshot per frame
+    counter = BlockCounter(block_colors, clock=clock.monotonic)
+    # Windowed rates, cycle times and utilization for the shift; metrics.snapshot() from code
+    metrics = MetricsEngine(block_colors, clock=clock.monotonic)
+    counter.listeners.append(metrics.on_block)
+
+    # Pick up where the last run (or crash) left off, then keep appending
+    shift = plog.replay(log_path, len(block_colors))
+    production_log = plog.ProductionLog(log_path, clock=clock.time)
+    if shift is not None:
+        counter.restore(shift.colors, shift.total)
+        state.update_line(total=shift.total, colors=shift.colors, elapsed=shift.run_seconds)
+        if shift.running:
+            production_log.append(plog.STOP, timestamp=shift.last_timestamp)
+        print("Resumed from log: {} blocks, {:.2f}s run time".format(shift.total, shift.run_seconds))
+    clock_offset = clock.time() - clock.monotonic()
+    counter.listeners.append(log_block)
+    if isinstance(processes, ProcessGroup):
+        # Filled in the sensing process; shown once it arrives
+        sensor.fill_pallets(pallet, on_filled=print_pallet)
+    else:
+        sensor.fill_pallets(pallet)
+        print_pallet()
+    sensor.attach(counter)
+
+def print_pallet():
+    for layer in range(pallet.layers):
+        print(pallet.names(layer))
+    print("Pallet: " + ", ".join("{} {}".format(color, count) for color, count in zip(pallet.colors, pallet.histogram())))
+
+def step_motor(steps=100, delay=0.01):
+    """Queues `steps` passes through step_sequence and returns the MotionHandle without waiting."""
+    stepper.set_speed(delay)
+    return stepper.jog(steps * len(step_sequence))
+
+def profiled_jog(steps=100):
+    """Like step_motor, but ramps up to MAX_SPEED and back down along MOTION_PROFILE."""
+    plan = plan_move(steps * len(step_sequence), MOTION_PROFILE, MAX_SPEED, ACCELERATION, JERK, START_SPEED)
+    return stepper.jog(plan.steps, delays=plan.delays)
+
+# ==============================================
+#                START OF MISC
+# ==============================================
+
+def observe_blocks(block, timestamp=None):
+    """Records one detected block. Safe to call from any thread."""
+    counter.report(block, timestamp)
+
+def refresh_counts():
+    """Applies queued detections and mirrors the counts into state."""
+    counts = counter.snapshot()
+    state.update_line(total=counts.total, colors=counts.colors)
+
+def refresh_motor():
+    """Mirrors the motor into state and reports a fault once."""
+    global motor_fault
+    if process_group is None:
+        # Otherwise the motion process publishes the motor itself
+        state.publish_stepper(stepper.status())
+    motor = state.motor if process_group is None else state.read_motor()
+    fault = MOTOR_STATES[motor.state] == "fault"
+    if fault and not motor_fault:
+        print("Motor fault: " + str(stepper.status().get("error")))
+    motor_fault = fault
+
+def check_processes():
+    """Process task: a dead motion or sensing process stops the line instead of leaving it unwatched."""
+    faults = process_group.check()
+    for fault in faults:
+        print("Process fault: " + fault)
+    if faults and state.line.running:
+        print("Stopping the line.")
+        core.submit(stop_run)
+
+def refresh_state():
+    refresh_counts()
+    refresh_motor()
+
+motor_fault = False
+
+# ==============================================
+#                START OF MAIN
+# ==============================================
+
+# Name of Circular Button = CircularButtonClass(positional argument x, positional argument y, size argument x, size argument y, color, dark color, darker color, text="TEXT")
+# Name of Rectangle Button = ButtonClass(rect=(positional argument x, positional argument y, size argument x, size argument y), text="TEXT", on_click=CLICKED_FUNCTION)
+# Name of TextBox = Console(rect=(positional argument x, positional argument y, size argument x, size argument y), text_font="monospace", text_size=TEXT_SIZE, max_lines=10 or MAX_LINES)
+
+def build_ui(fullscreen):
+    global start_button, stop_button, jog_button, exit_button, color_blocks, reset_count, block_stats, reset_time, reset_total, profiler_overlay, drawn_assets
+
+    start_button = CircleButton(552, 102, 47, (15, 180, 30), (15, 160, 30), (15, 140, 30), text="START")
+
+    stop_button = CircleButton(726, 102, 47, (180, 15, 30), (160, 15, 30), (140, 15, 30), text="STOP")
+
+    jog_button = CircleButton(275, 425, 47, (200, 210, 255), (180, 190, 235), (160, 170, 215), text="JOG")
+
+    exit_button = Button(rect=(10, 10, 30, 30), text="X", on_click=lambda: stop_program())
+
+    text_font = "Calibri"
+
+    color_blocks = Console(rect=(552, 196, 219, 143), text_font=text_font, text_size=19, max_lines=7)
+    color_blocks.define_fields(["red", None, "blue", None, "green", None, "yellow"])
+
+    reset_count = Button(rect=(color_blocks.rect.x + 54, color_blocks.rect.y + color_blocks.rect.height + 3, 110, 29), radius=4, text_font=text_font, text_size=18, text="Reset Count", on_click=command(rst_count))
+
+    block_stats = Console(rect=(552, 373, 219, 67), text_font=text_font, text_size=19, max_lines=3)
+    block_stats.define_fields(["run_time", "rate", "part_count"], volatile=["run_time"])
+
+    reset_time = Button(rect=(block_stats.rect.x, block_stats.rect.y + block_stats.rect.height + 6, 105, 29), radius=4, text_font=text_font, text_size=18, text="Reset Time", on_click=command(rst_time))
+    reset_total = Button(rect=(color_blocks.rect.x + color_blocks.rect.width - 110, block_stats.rect.y + block_stats.rect.height + 6, 110, 29), radius=4, text_font=text_font, text_size=18, text="Reset Count", on_click=command(rst_total))
+
+    # F3 shows it; last in drawn_assets so it stays on top
+    profiler_overlay = ProfilerOverlay(rect=(50, 10, 320, 190), instruments=instruments, stepper=stepper)
+
+    drawn_assets = [
+        start_button,
+        stop_button,
+        exit_button,
+        reset_count,
+        reset_time,
+        reset_total,
+        jog_button,
+        color_blocks,
+        block_stats,
+        profiler_overlay
+    ]
+
+    if fullscreen:
+        x_offset = 27
+
+        for asset in drawn_assets:
+            try:
+                asset.x += x_offset
+            except AttributeError:
+                asset.rect.x += x_offset
+
+def draw_assets():
+    """Repaints the assets that changed since the last frame and returns the screen rects touched."""
+    global renderer
+    return renderer.draw()
+
+# ==============================================
+#                 START OF LOOP
+# ==============================================
+
+def open_display(fullscreen):
+    """Opens the window and shows the background straight away, before any hardware is touched."""
+    global screen, screen_width, screen_height, assets, background
+
+    if fullscreen:
+        screen = pygame.display.set_mode((1280, 720), pygame.FULLSCREEN)
+    else:
+        screen = pygame.display.set_mode((800, 480), pygame.RESIZABLE)
+    screen_width, screen_height = pygame.display.get_surface().get_size()
+    pygame.display.set_caption("Conveyor")
+
+    # Drawn at its native size: the buttons and panels in the artwork sit
+    # under the widgets' 800x480 coordinates (shifted by build_ui's x_offset
+    # for the wider fullscreen crop), so scaling it would misalign them
+    assets = AssetManager(ASSET_DIR, ASSET_CACHE_DIR)
+    background = assets.get("cropped-background.png" if fullscreen else "background.png")
+    screen.blit(background, (0, 0))
+    pygame.display.flip()
+
+def line_idle():
+    """Stopped, motor still and no input for a while: the UI can sleep until something happens."""
+    return frame_scheduler.idle and not state.line.running and not stepper.busy
+
+def poll_input():
+    """
+    Input task. While the line is idle it blocks in pygame.event.wait until
+    another task is due, so any input is handled at once without polling;
+    returns the seconds spent waiting there.
+    """
+    waited = 0.0
+    timeout = core.idle_timeout("input") if line_idle() else 0.0
+    if timeout is None or timeout > 0:
+        started = time.perf_counter()
+        events = frame_scheduler.wait_events(1.0 / IDLE_FPS if timeout is None else timeout)
+        waited = time.perf_counter() - started
+    else:
+        events = pygame.event.get()
+    with instruments.section("events"):
+        handle_events(events)
+    return waited
+
+def handle_events(events):
+    """Turns pygame events into commands."""
+    global screen_width, screen_height
+
+    if frame_scheduler.note_input(events):
+        # Was idling: draw the response now and take the parked tasks back up
+        core.wake_all()
+
+    for event in events:
+        if event.type == pygame.QUIT:
+            stop_program()
+
+        if event.type == pygame.KEYUP:
+            if event.key == pygame.K_ESCAPE:
+                print("Escape Pressed\nStopping program...\nProgram Stopped.")
+                stop_program()
+            elif event.key == pygame.K_F3:
+                profiler_overlay.toggle()
+            elif event.key == pygame.K_F4:
+                toggle_profile()
+
+        if event.type == pygame.VIDEORESIZE:
+            screen_width, screen_height = screen.get_size()
+            renderer.set_background(background, background.get_rect())
+
+        if event.type == pygame.VIDEOEXPOSE:
+            renderer.invalidate()
+
+        if start_button.is_clicked(event):
+            start_button.clicked = True
+            core.submit(start_run)
+
+        if stop_button.is_clicked(event):
+            pause_timer()
+            stop_button.clicked = True
+            core.submit(stop_run)
+        else:
+            stop_button.clicked = False
+
+        if jog_button.is_clicked(event):
+            jog_button.clicked = True
+            pause_timer()
+            core.submit(jog)
+        else:
+            jog_button.clicked = False
+
+        if start_button.clicked:
+            reset_count.bg_color=(150,150,150)
+            reset_time.bg_color=(150,150,150)
+            reset_total.bg_color=(150,150,150)
+        else:
+            reset_count.bg_color=(200,200,200)
+            reset_time.bg_color=(200,200,200)
+            reset_total.bg_color=(200,200,200)
+            reset_count.handle_event(event)
+            reset_time.handle_event(event)
+            reset_total.handle_event(event)
+
+        exit_button.handle_event(event)
+
+def render_frame():
+    """Render task: consoles from state, then repaint what changed."""
+    frame_scheduler.begin_frame()
+    with instruments.section("update"):
+        update_color_blocks(state.line.colors)
+        update_stats(get_elapsed_time())
+    with instruments.section("draw"):
+        rects = draw_assets()
+    with instruments.section("flip"):
+        pygame.display.update(rects)
+    frame_scheduler.end_frame()
+    instruments.mark("frame")
+
+def publish_telemetry():
+    """Telemetry task: keeps the run timer in state current even while the UI idles."""
+    update_elapsed()
+
+def create_core(on_ready=None):
+    """
+    The controller as asyncio tasks, each with a period and time budget:
+    input, render, motor (status and faults; the coils are stepped by
+    StepperEngine's thread, whose timing asyncio can't match), sensor
+    (detections into the counts), telemetry and, with --processes, a
+    liveness check on the motion and sensing processes.
+    """
+    core = ControlCore()
+    # A command from another thread (telemetry) mustn't wait out an idle input wait
+    core.interrupt = frame_scheduler.wake
+
+    core.add("input", poll_input, lambda: 0.0 if line_idle() else INPUT_PERIOD, INPUT_BUDGET)
+
+    def render():
+        nonlocal on_ready
+        render_frame()
+        if on_ready is not None:
+            callback, on_ready = on_ready, None
+            callback()
+    core.add("render", render, lambda: frame_scheduler.frame_period(active=state.line.running), RENDER_BUDGET, wakeable=True)
+
+    def unless_idle(period):
+        # Parked while the line is idle; input and commands wake them
+        return lambda: None if line_idle() else period
+    core.add("motor", refresh_motor, unless_idle(MOTOR_PERIOD), MOTOR_BUDGET, wakeable=True)
+    core.add("sensor", refresh_counts, unless_idle(SENSOR_PERIOD), SENSOR_BUDGET, wakeable=True)
+    core.add("telemetry", publish_telemetry, unless_idle(TELEMETRY_PERIOD), TELEMETRY_BUDGET, wakeable=True)
+    if isinstance(process_group, ProcessGroup):
+        core.add("processes", check_processes, PROCESS_PERIOD, PROCESS_BUDGET)
+    return core
+
+def run(fullscreen, overlay=False, on_ready=None):
+    """The UI and control loop. on_ready is called once the first full frame is on screen."""
+    global renderer, frame_scheduler, core
+
+    pygame.display.set_caption(hw.caption)
+    build_ui(fullscreen)
+    profiler_overlay.visible = overlay
+
+    renderer = Renderer(screen, background, background.get_rect(), drawn_assets)
+    frame_scheduler = FrameScheduler(target_fps=TARGET_FPS, idle_fps=IDLE_FPS)
+    refresh_state()
+    core = create_core(on_ready)
+    core.run()
+
+# ==============================================
+#           START OF STARTUP AND HOMING
+# ==============================================
+
+HOMING_MODES = ("none", "jog", "selftest")
+DISPLAY_MODES = ("window", "fullscreen")
+
+def start_homing(mode, steps=100):
+    """
+    Runs after the UI is up. "jog" moves the belt forward `steps` like the
+    old startup jog, without blocking anything; "selftest" exercises the
+    motor and sensor on a background thread and prints the results.
+    """
+    if mode == "jog":
+        print("Jogging motor forward {} steps...".format(steps))
+        step_motor(steps=steps, delay=0.01)
+    elif mode == "selftest":
+        threading.Thread(target=_self_test, args=(steps,), name="self-test", daemon=True).start()
+
+def _self_test(steps, delay=0.01):
+    # The motor task may be parked; have it follow the test's jogs
+    core.wake_all()
+    steps *= len(step_sequence)
+    stepper.set_speed(delay)
+    results = run_self_test(stepper, sensor, steps=steps, timeout=1.0 + 2 * steps * delay)
+    print("Self-test " + ("passed" if all(result.ok for result in results) else "FAILED") + ":\n" + format_results(results))
+
+def read_config(path):
+    """
+    Option defaults from an INI file, keyed like the command line options.
+
+        [display]  mode = window | fullscreen, overlay = yes | no
+        [hardware] backend = pi | mock, processes = yes | no, camera = /dev/video0
+        [pins]     output = 11, stepper = 17, coils = 28 23 27 22
+        [startup]  homing = none | jog | selftest, homing_steps = 100
+        [telemetry] port = 8765, host = 127.0.0.1
+
+    Values are held to the same choices and pin counts as the command line
+    options; a bad one raises ValueError naming the file, section and key.
+    """
+    config = configparser.ConfigParser()
+    if not config.read(path):
+        return {}
+
+    defaults = {}
+    def take(section, key, dest, convert=str, choices=None):
+        if not config.has_option(section, key):
+            return
+        value = config.get(section, key)
+        try:
+            value = convert(value)
+        except ValueError as e:
+            raise ValueError("{} [{}] {} = {}: {}".format(path, section, key, value, e))
+        if choices is not None and value not in choices:
+            raise ValueError("{} [{}] {} = {}: expected one of {}".format(path, section, key, value, ", ".join(choices)))
+        defaults[dest] = value
+    def flag(value):
+        if value.strip().lower() not in config.BOOLEAN_STATES:
+            raise ValueError("expected yes or no")
+        return config.BOOLEAN_STATES[value.strip().lower()]
+    def coil_pins(value):
+        pins = [int(pin) for pin in value.replace(",", " ").split()]
+        if len(pins) != 4:
+            raise ValueError("expected 4 pins (IN1..IN4), got {}".format(len(pins)))
+        return pins
+
+    take("display", "mode", "display", choices=DISPLAY_MODES)
+    take("display", "overlay", "overlay", flag)
+    take("hardware", "backend", "backend", choices=sorted(BACKENDS))
+    take("hardware", "processes", "processes", flag)
+    take("hardware", "camera", "camera")
+    take("pins", "output", "output_pin", int)
+    take("pins", "stepper", "stepper_pin", int)
+    take("pins", "coils", "coil_pins", coil_pins)
+    take("startup", "homing", "homing", choices=HOMING_MODES)
+    take("startup", "homing_steps", "homing_steps", int)
+    take("telemetry", "port", "telemetry_port", int)
+    take("telemetry", "host", "telemetry_host")
+    return defaults
+
+def start_telemetry(host, port):
+    """Remote start/stop/jog go through the control core like the buttons do."""
+    global telemetry
+    commands = {
+        "start": lambda: core is not None and core.submit(start_run),
+        "stop": lambda: core is not None and core.submit(stop_run),
+        "jog": lambda: core is not None and core.submit(jog),
+    }
+    try:
+        telemetry = TelemetryServer(state, block_colors, commands, host=host, port=port, pallet=pallet).start()
+    except OSError as e:
+        print("Telemetry server not started: " + str(e))
+        return
+    print("Telemetry on {}:{} (python -m conveyor.telemetry_server watch --port {})".format(host, telemetry.port, telemetry.port))
+
+def report_startup(marks):
+    """marks: (label, perf_counter) in order, starting from IMPORT_STARTED."""
+    parts = []
+    for (_, before), (label, after) in zip(marks, marks[1:]):
+        parts.append("{} {:.0f}".format(label, 1000 * (after - before)))
+    print("Startup {:.0f} ms: {} ms".format(1000 * (marks[-1][1] - marks[0][1]), ", ".join(parts)))
+
+def main(argv=None, default_backend=None):
+    global output_pin, stepper_pin, IN1, IN2, IN3, IN4
+    marks = [("import", IMPORT_STARTED), ("imports", time.perf_counter())]
+
+    pre = argparse.ArgumentParser(add_help=False)
+    pre.add_argument("--config", default=CONFIG_PATH)
+    config_path = pre.parse_known_args(argv)[0].config
+
+    parser = argparse.ArgumentParser(description="Conveyor controller HMI.")
+    parser.add_argument("--config", default=CONFIG_PATH, help="INI file with option defaults (default: conveyor.ini next to main.py)")
+    parser.add_argument("--display", choices=DISPLAY_MODES, default="window", help="resizable 800x480 window or fullscreen")
+    parser.add_argument("--homing", choices=HOMING_MODES, default="jog",
+                        help="after the UI is up: nothing, jog the belt forward, or run the motor/sensor self-test (default: jog)")
+    parser.add_argument("--homing-steps", type=int, default=100, help="sequence passes for the homing jog")
+    parser.add_argument("--output-pin", type=int, default=output_pin, help="BCM pin switching the conveyor")
+    parser.add_argument("--stepper-pin", type=int, default=stepper_pin, help="BCM pin set high by the JOG button (it is never set low again)")
+    parser.add_argument("--coil-pins", type=int, nargs=4, default=[IN1, IN2, IN3, IN4], metavar="PIN", help="BCM pins IN1..IN4")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=None,
+                        help="hardware backend (default: $CONVEYOR_BACKEND, else " + (default_backend or "pi") + ")")
+    parser.add_argument("--verbose-gpio", action="store_true", help="mock backend: print every pin write")
+    parser.add_argument("--camera", default=None, metavar="DEVICE_OR_DIR",
+                        help="classify blocks from a V4L2 camera (e.g. /dev/video0) or a directory of recorded images")
+    parser.add_argument("--seed", type=int, default=None, help="mock backend: seed the simulated pallets")
+    parser.add_argument("--overlay", action="store_true", help="start with the profiling overlay shown (F3 toggles it)")
+    parser.add_argument("--processes", action="store_true",
+                        help="step the motor and read the sensor in their own processes, leaving this one to the UI")
+    parser.add_argument("--telemetry-port", type=int, default=None, metavar="PORT",
+                        help="serve counts, run state and start/stop/jog over TCP on this port (python -m conveyor.telemetry_server)")
+    parser.add_argument("--telemetry-host", default="127.0.0.1", help="address to serve telemetry on (default: localhost only)")
+    try:
+        parser.set_defaults(**read_config(config_path))
+    except ValueError as e:
+        parser.error(str(e))
+    args = parser.parse_args(argv)
+
+    output_pin, stepper_pin = args.output_pin, args.stepper_pin
+    IN1, IN2, IN3, IN4 = args.coil_pins
+    name = args.backend or os.environ.get("CONVEYOR_BACKEND") or default_backend or "pi"
+    options = dict(coil_output=COIL_BACKEND, verbose_gpio=args.verbose_gpio, camera=args.camera, color_lut=COLOR_LUT_PATH, seed=args.seed)
+    shared = SharedState.create(len(block_colors))
+    print("Shared state: " + shared.name + " (python -m conveyor.shared_state " + shared.name + " to watch it)")
+    processes = None
+    if args.processes:
+        # The camera belongs to the sensing process; this one and motion build theirs without it
+        options["camera"] = None
+        processes = ProcessGroup(name, options, [IN1, IN2, IN3, IN4], step_sequence, pallet, shared, camera=args.camera)
+
+    # Pixels first: the window and background go up before any hardware is touched
+    pygame.init()
+    fullscreen = args.display == "fullscreen"
+    open_display(fullscreen)
+    marks.append(("display", time.perf_counter()))
+
+    setup_hardware(create_backend(name, **options), shared, processes)
+    marks.append(("hardware", time.perf_counter()))
+    if args.telemetry_port is not None:
+        start_telemetry(args.telemetry_host, args.telemetry_port)
+
+    def ready():
+        marks.append(("first frame", time.perf_counter()))
+        report_startup(marks)
+        start_homing(args.homing, args.homing_steps)
+
+    # A task's exception or Ctrl-C ends run() too: the pins, log and shared memory are still released
+    try:
+        run(fullscreen, args.overlay, on_ready=ready)
+    except KeyboardInterrupt:
+        print("Interrupted")
+    finally:
+        shutdown()
+    sys.exit()
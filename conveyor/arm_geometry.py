@@ -0,0 +1,40 @@
+from collections import namedtuple
+
+# ==============================================
+#              START OF ARM GEOMETRY
+# ==============================================
+
+# Where things are in the DOBOT Magician's coordinates, in mm, and where each
+# block goes. Nothing here needs the serial code in dobot.py (termios, so
+# POSIX-only), so a pallet can be planned anywhere. Blocks are 25 mm cubes;
+# the conveyor delivers each one to PICK (x, y, z, r), and the pallet is a
+# grid of slots per layer starting at PALLET_ORIGIN.
+BLOCK_SIZE = 25.0
+PICK = (250.0, -120.0, -40.0, 0.0)
+PALLET_ORIGIN = (200.0, 80.0, -55.0)
+SLOT_PITCH = 30.0
+PALLET_COLUMNS = 3
+
+# Jump moves lift JUMP_HEIGHT above the higher end, never above JUMP_Z_LIMIT
+JUMP_HEIGHT = 40.0
+JUMP_Z_LIMIT = 60.0
+
+# ==============================================
+#              START OF PALLET PLAN
+# ==============================================
+
+PickPlace = namedtuple("PickPlace", ["layer", "slot", "color", "place"])
+
+def slot_position(layer, slot, columns=PALLET_COLUMNS):
+    """Arm (x, y, z) of a slot: row-major across the layer, one block height per layer."""
+    row, column = divmod(slot, columns)
+    x, y, z = PALLET_ORIGIN
+    return (x + row * SLOT_PITCH, y + column * SLOT_PITCH, z + layer * BLOCK_SIZE)
+
+def plan_pallets(pallet, columns=PALLET_COLUMNS):
+    """One PickPlace per block of a Pallet, layer by layer (bottom first), slots in order."""
+    operations = []
+    for layer in range(pallet.layers):
+        for slot, code in enumerate(pallet.layer(layer)):
+            operations.append(PickPlace(layer, slot, pallet.colors[code], slot_position(layer, slot, columns)))
+    return operations
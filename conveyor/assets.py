@@ -0,0 +1,129 @@
+import os
+import struct
+import time
+import zlib
+
+import pygame
+
+# ==============================================
+#              START OF ASSET MANAGER
+# ==============================================
+
+# Disk cache entry: header, then zlib-compressed RGB pixels at the scaled size.
+#   magic, width, height, source mtime (ns), source size
+CACHE_MAGIC = b"CONVIMG1"
+CACHE_HEADER = struct.Struct("<8sIIqq")
+
+# pygame before 2.1.3 only has the *string names
+_tobytes = getattr(pygame.image, "tobytes", None) or pygame.image.tostring
+_frombytes = getattr(pygame.image, "frombytes", None) or pygame.image.fromstring
+
+def _png_size(path):
+    """Width and height from the PNG header, without decoding the image."""
+    with open(path, "rb") as f:
+        header = f.read(24)
+    if header[:8] != b"\x89PNG\r\n\x1a\n":
+        return pygame.image.load(path).get_size()
+    return struct.unpack(">II", header[16:24])
+
+class AssetManager:
+    """
+    Loads each image once, converts it to the display's pixel format and
+    hands it out at its native size, or scaled to a size that is asked for,
+    remembered per (name, size).
+
+    Every variant is also written to `cache_dir` as compressed raw pixels.
+    On the Pi's SD card reading those back is far cheaper than reading and
+    decoding the PNG (and scaling it again). An entry is thrown away when
+    its source image changes. cache_dir=None keeps everything in memory.
+
+    Needs a display mode set before the first call (for convert()).
+    """
+
+    def __init__(self, asset_dir, cache_dir=None):
+        self.asset_dir = asset_dir
+        self.cache_dir = cache_dir
+        self.sources = {}
+        self.scaled = {}
+        self.disk_hits = 0
+        self.disk_misses = 0
+        self.load_seconds = 0.0
+
+    def path(self, name):
+        return os.path.join(self.asset_dir, name)
+
+    def source(self, name):
+        """The full-size image, converted."""
+        image = self.sources.get(name)
+        if image is None:
+            started = time.perf_counter()
+            image = self.sources[name] = pygame.image.load(self.path(name)).convert()
+            self.load_seconds += time.perf_counter() - started
+        return image
+
+    def get(self, name, size=None):
+        """`name` converted and scaled to `size` (native size if None)."""
+        size = tuple(size) if size is not None else _png_size(self.path(name))
+        key = (name, size)
+        image = self.scaled.get(key)
+        if image is not None:
+            return image
+
+        started = time.perf_counter()
+        image = self._read_cache(name, size)
+        if image is None:
+            source = self.source(name)
+            image = source if source.get_size() == size else pygame.transform.smoothscale(source, size)
+            self._write_cache(name, size, image)
+        self.scaled[key] = image
+        self.load_seconds += time.perf_counter() - started
+        return image
+
+    def stats(self):
+        return {
+            "sources": len(self.sources),
+            "scaled": len(self.scaled),
+            "disk_hits": self.disk_hits,
+            "disk_misses": self.disk_misses,
+            "load_ms": 1000 * self.load_seconds,
+        }
+
+    # ---------- Disk cache ----------
+
+    def _cache_path(self, name, size):
+        base = os.path.splitext(name)[0]
+        return os.path.join(self.cache_dir, "{}-{}x{}.img".format(base, size[0], size[1]))
+
+    def _read_cache(self, name, size):
+        if self.cache_dir is None:
+            return None
+        path = self._cache_path(name, size)
+        try:
+            source = os.stat(self.path(name))
+            with open(path, "rb") as f:
+                magic, width, height, mtime, length = CACHE_HEADER.unpack(f.read(CACHE_HEADER.size))
+                if magic != CACHE_MAGIC or (width, height) != size or mtime != source.st_mtime_ns or length != source.st_size:
+                    self.disk_misses += 1
+                    return None
+                pixels = zlib.decompress(f.read())
+        except (OSError, struct.error, zlib.error):
+            self.disk_misses += 1
+            return None
+        self.disk_hits += 1
+        return _frombytes(pixels, size, "RGB").convert()
+
+    def _write_cache(self, name, size, image):
+        if self.cache_dir is None:
+            return
+        source = os.stat(self.path(name))
+        path = self._cache_path(name, size)
+        temp = path + ".tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(temp, "wb") as f:
+                f.write(CACHE_HEADER.pack(CACHE_MAGIC, size[0], size[1], source.st_mtime_ns, source.st_size))
+                f.write(zlib.compress(_tobytes(image, "RGB"), 1))
+            os.replace(temp, path)
+        except OSError as e:
+            # A read-only card just means no cache
+            print("Asset cache not written: " + str(e))
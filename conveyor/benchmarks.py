@@ -0,0 +1,259 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+# Must be set before pygame opens a display
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+from . import app
+from .assets import AssetManager
+from .counting import BlockCounter
+from .hardware import MockBackend, QuietGPIOMock
+from .metrics import MetricsEngine
+from .motion_planner import STEP_SEQUENCES
+from .pin_group import ListOutputBackend, PinGroup
+from .renderer import Renderer
+from .shared_state import SharedState
+from .stepper import StepperEngine
+from .text_cache import text_cache
+
+# ==============================================
+#                START OF HELPERS
+# ==============================================
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def _timings(prefix, seconds):
+    """mean/p50/p95/max in milliseconds for a list of durations in seconds."""
+    ms = [1000 * s for s in seconds]
+    return {
+        prefix + "_mean_ms": statistics.fmean(ms),
+        prefix + "_p50_ms": _percentile(ms, 0.50),
+        prefix + "_p95_ms": _percentile(ms, 0.95),
+        prefix + "_max_ms": max(ms),
+    }
+
+def _widget_label(index, widget):
+    text = getattr(widget, "text", None) or "{},{}".format(widget.rect.x, widget.rect.y)
+    return "{}_{}[{}]".format(index, type(widget).__name__.lower(), text)
+
+# ==============================================
+#             START OF RENDER BENCHMARKS
+# ==============================================
+
+def setup_app(log_dir):
+    """Brings the application up against the mock backend on a dummy display, like main() minus the prompt."""
+    pygame.init()
+    screen = pygame.display.set_mode((800, 480))
+    app.setup_hardware(MockBackend(seed=1), SharedState.create(len(app.block_colors)), log_path=os.path.join(log_dir, "production.bin"))
+    app.build_ui(False)
+    image = AssetManager(app.ASSET_DIR).get("background.png")
+    app.renderer = Renderer(screen, image, image.get_rect(), app.drawn_assets)
+    app.start_button.clicked = False
+    return screen
+
+def teardown_app():
+    app.sensor.close()
+    app.stepper.shutdown()
+    app.production_log.close()
+    app.state.close()
+    pygame.quit()
+
+def bench_frames(frames=600, block_every=10, full_redraw=False):
+    """
+    Runs the per-frame work of app.run: counts, consoles, draw_assets and
+    display.update, with a block detected every `block_every` frames so the
+    counters really change. full_redraw repaints everything every frame.
+    """
+    durations = []
+    misses = text_cache.misses
+    pixels = 0
+    for frame in range(frames):
+        if frame % block_every == 0:
+            app.observe_blocks(app.block_colors[frame // block_every % len(app.block_colors)])
+        if full_redraw:
+            app.renderer.invalidate()
+        started = time.perf_counter()
+        app.refresh_state()
+        app.update_color_blocks(app.state.line.colors)
+        app.update_stats(app.get_elapsed_time())
+        rects = app.draw_assets()
+        pygame.display.update(rects)
+        durations.append(time.perf_counter() - started)
+        pixels += sum(rect.width * rect.height for rect in rects)
+
+    prefix = "frame_full" if full_redraw else "frame"
+    results = _timings(prefix, durations)
+    results[prefix + "_font_renders"] = (text_cache.misses - misses) / frames
+    results[prefix + "_kpixels_pushed"] = pixels / frames / 1000
+    return results
+
+def bench_widgets(screen, repeats=500, rounds=5):
+    """Cost of one forced draw of each widget, text cache warm. Best of `rounds` to keep noise out."""
+    results = {}
+    for i, widget in enumerate(app.drawn_assets):
+        widget.draw(screen)
+        best = None
+        for _ in range(rounds):
+            started = time.perf_counter()
+            for _ in range(repeats):
+                widget.draw(screen)
+            seconds = (time.perf_counter() - started) / repeats
+            best = seconds if best is None else min(best, seconds)
+        results["widget_" + _widget_label(i, widget) + "_us"] = 1e6 * best
+    return results
+
+# ==============================================
+#          START OF MOTION AND COUNTING
+# ==============================================
+
+def bench_stepper(steps=2000, delay=0.001):
+    """
+    Step rate and timing error of the StepperEngine thread writing real
+    coil payloads to the quiet mock. delay=0 measures the top rate.
+    """
+    pins = [app.IN1, app.IN2, app.IN3, app.IN4]
+    coils = PinGroup(pins, ListOutputBackend(QuietGPIOMock()))
+    engine = StepperEngine(coils.write, coils.compile(STEP_SEQUENCES["full"]), delay=delay).start()
+    try:
+        started = time.perf_counter()
+        engine.jog(steps).wait()
+        elapsed = time.perf_counter() - started
+        status = engine.status()
+    finally:
+        engine.shutdown()
+    prefix = "stepper_max" if delay == 0 else "stepper"
+    results = {prefix + "_steps_per_s": steps / elapsed}
+    if delay:
+        results[prefix + "_late_avg_ms"] = status["late_avg_ms"]
+        results[prefix + "_late_max_ms"] = status["late_max_ms"]
+    return results
+
+def bench_counting(events=200000):
+    """report() and snapshot() throughput of BlockCounter with the metrics listener attached."""
+    colors = app.block_colors
+    counter = BlockCounter(colors)
+    metrics = MetricsEngine(colors)
+    counter.listeners.append(metrics.on_block)
+
+    now = time.monotonic()
+    started = time.perf_counter()
+    for i in range(events):
+        counter.report(colors[i % len(colors)], now + i * 0.001)
+    reported = time.perf_counter() - started
+
+    started = time.perf_counter()
+    counter.snapshot()
+    applied = time.perf_counter() - started
+    return {
+        "counting_report_per_s": events / reported,
+        "counting_apply_per_s": events / applied,
+    }
+
+# ==============================================
+#               START OF COMPARISON
+# ==============================================
+
+def higher_is_better(name):
+    return name.endswith("_per_s")
+
+def compare(results, baseline, threshold=0.25, floor_ms=0.05):
+    """
+    Metrics that got more than `threshold` worse than baseline, as
+    (name, baseline, current, change) tuples. Single worst samples (_max_ms)
+    and timings below floor_ms in both runs are reported but never gated on;
+    they are mostly scheduler noise.
+    """
+    regressions = []
+    for name, before in baseline.items():
+        after = results.get(name)
+        if after is None or not before or name.endswith("_max_ms"):
+            continue
+        if name.endswith("_ms") and max(before, after) < floor_ms:
+            continue
+        change = (after - before) / abs(before)
+        worse = -change if higher_is_better(name) else change
+        if worse > threshold:
+            regressions.append((name, before, after, change))
+    return regressions
+
+def best_of(rounds, bench, *args, **kwargs):
+    """Runs a benchmark `rounds` times and keeps the best value of each metric."""
+    best = bench(*args, **kwargs)
+    for _ in range(rounds - 1):
+        for name, value in bench(*args, **kwargs).items():
+            best[name] = max(best[name], value) if higher_is_better(name) else min(best[name], value)
+    return best
+
+def run_all(frames=600, stepper_steps=2000, events=200000, rounds=3):
+    log_dir = tempfile.mkdtemp(prefix="conveyor-bench-")
+    results = {}
+    try:
+        screen = setup_app(log_dir)
+        try:
+            # Warm up the text cache and first full repaint
+            bench_frames(frames=30)
+            results.update(bench_frames(frames))
+            results.update(bench_frames(frames // 4, full_redraw=True))
+            results.update(bench_widgets(screen))
+        finally:
+            teardown_app()
+        results.update(best_of(rounds, bench_stepper, stepper_steps, delay=0.001))
+        results.update(best_of(rounds, bench_stepper, stepper_steps * 10, delay=0))
+        results.update(best_of(rounds, bench_counting, events))
+    finally:
+        path = os.path.join(log_dir, "production.bin")
+        if os.path.exists(path):
+            os.remove(path)
+        os.rmdir(log_dir)
+    return results
+
+def metadata():
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": platform.node(),
+        "machine": platform.machine(),
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "video_driver": os.environ.get("SDL_VIDEODRIVER"),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the render loop, widgets, stepper and counting against the mock backend.")
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--stepper-steps", type=int, default=2000)
+    parser.add_argument("--events", type=int, default=200000)
+    parser.add_argument("--rounds", type=int, default=3, help="stepper and counting runs, best kept")
+    parser.add_argument("--save", metavar="PATH", help="write results as JSON")
+    parser.add_argument("--compare", metavar="BASELINE", help="JSON from an earlier run; exit 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown as a fraction (default 0.25)")
+    args = parser.parse_args()
+
+    results = run_all(args.frames, args.stepper_steps, args.events, args.rounds)
+    for name, value in results.items():
+        print("{:44s} {:14,.3f}".format(name, value))
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"meta": metadata(), "results": results}, f, indent=2, sort_keys=True)
+        print("Saved to " + args.save)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for name, before, after, change in regressions:
+            print("REGRESSION {}: {:.3f} -> {:.3f} ({:+.0%})".format(name, before, after, change))
+        if regressions:
+            sys.exit(1)
+        print("No regressions beyond {:.0%} against {}".format(args.threshold, args.compare))
@@ -0,0 +1,135 @@
+import argparse
+import hashlib
+import os
+import time
+
+import numpy as np
+
+from .vision import HSVClassifier
+
+# ==============================================
+#            START OF COLOR LOOKUP TABLE
+# ==============================================
+
+def table_key(classifier, bits):
+    """Identifies the table an HSVClassifier and `bits` build; any change to either changes it."""
+    ranges = [(color, tuple(classifier.hue_ranges.get(color, ()))) for color in classifier.colors]
+    params = (ranges, classifier.min_saturation, classifier.min_value, bits)
+    return hashlib.sha1(repr(params).encode()).hexdigest()
+
+class LUTClassifier:
+    """
+    Classifies pixels with a precomputed RGB -> code table.
+
+    The table is quantized to `bits` per channel (32x32x32 by default) and
+    stored flat, so a frame is classified with a couple of shifts and one
+    np.take instead of an HSV conversion and threshold tests per pixel.
+    Codes match HSVClassifier: 0 for background, i + 1 for colors[i].
+    """
+
+    def __init__(self, table, bits=5):
+        self.bits = bits
+        self.shift = 8 - bits
+        self.table = table.reshape(-1)
+
+    @classmethod
+    def build(cls, classifier, bits=5):
+        """Evaluates `classifier` once at the center of every quantized RGB cell."""
+        levels = 1 << bits
+        step = 256 // levels
+        centers = (np.arange(levels) * step + step // 2).astype(np.uint8)
+        r, g, b = np.meshgrid(centers, centers, centers, indexing="ij")
+        grid = np.stack([r, g, b], axis=-1)
+        return cls(classifier.classify(grid).astype(np.uint8), bits)
+
+    @classmethod
+    def load(cls, path):
+        """Memory-maps a saved table, so startup doesn't pay for building or reading it."""
+        table = np.load(path, mmap_mode="r")
+        bits = int(round(np.log2(table.shape[0])))
+        return cls(table, bits)
+
+    @classmethod
+    def load_or_build(cls, path, colors, bits=5):
+        """
+        Loads the table at `path` if its key file (path + ".key") matches the
+        colors, thresholds and bits asked for, else builds and saves a new one.
+        """
+        classifier = HSVClassifier(colors)
+        key = table_key(classifier, bits)
+        try:
+            with open(path + ".key") as f:
+                if f.read().strip() == key:
+                    return cls.load(path)
+        except OSError:
+            pass
+        lut = cls.build(classifier, bits)
+        lut.save(path, key)
+        return lut
+
+    def save(self, path, key=None):
+        """Writes the table, then `key` (from table_key) next to it for load_or_build."""
+        levels = 1 << self.bits
+        np.save(path, np.ascontiguousarray(self.table).reshape(levels, levels, levels))
+        if key is not None:
+            with open(path + ".key", "w") as f:
+                f.write(key + "\n")
+
+    def classify(self, pixels):
+        quantized = (pixels >> self.shift).astype(np.intp)
+        index = (quantized[..., 0] << (2 * self.bits)) | (quantized[..., 1] << self.bits) | quantized[..., 2]
+        return np.take(self.table, index)
+
+# ==============================================
+#               START OF BENCHMARKS
+# ==============================================
+
+def benchmark(lut, colors, pixels=200000, frame_size=(320, 240), repeats=20, seed=1):
+    """
+    Accuracy is agreement with exact HSV thresholding on random pixels, both
+    overall and over the pixels HSV calls a block color. Throughput is
+    measured on a random frame of frame_size.
+    """
+    rng = np.random.default_rng(seed)
+    hsv = HSVClassifier(colors)
+
+    samples = rng.integers(0, 256, size=(pixels, 3), dtype=np.uint8)
+    expected = hsv.classify(samples)
+    agreement = float(np.mean(lut.classify(samples) == expected))
+    vivid = expected > 0
+    vivid_agreement = float(np.mean(lut.classify(samples[vivid]) == expected[vivid])) if vivid.any() else 1.0
+
+    frame = rng.integers(0, 256, size=(frame_size[0], frame_size[1], 3), dtype=np.uint8)
+    results = {"agreement": agreement, "block_agreement": vivid_agreement}
+    for name, classifier in (("hsv", hsv), ("lut", lut)):
+        classifier.classify(frame)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            classifier.classify(frame)
+        seconds = (time.perf_counter() - start) / repeats
+        results[name + "_ms_per_frame"] = 1000 * seconds
+        results[name + "_mpix_per_s"] = frame.shape[0] * frame.shape[1] / seconds / 1e6
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the color lookup table and compare it against HSV thresholding.")
+    parser.add_argument("--path", default="color_lut.npy", help="where to save the table")
+    parser.add_argument("--bits", type=int, default=5, help="bits per channel (5 -> 32x32x32)")
+    parser.add_argument("--colors", nargs="+", default=["Red", "Blue", "Green", "Yellow"])
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    classifier = HSVClassifier(args.colors)
+    lut = LUTClassifier.build(classifier, args.bits)
+    print("Built {0}x{0}x{0} table in {1:.1f} ms".format(1 << args.bits, 1000 * (time.perf_counter() - start)))
+    if not args.no_save:
+        lut.save(args.path, table_key(classifier, args.bits))
+        start = time.perf_counter()
+        LUTClassifier.load(args.path)
+        print("Saved to {}, mmap load {:.2f} ms".format(args.path, 1000 * (time.perf_counter() - start)))
+
+    results = benchmark(lut, args.colors)
+    print("Agreement with HSV: {:.2%} of all pixels, {:.2%} of block-colored pixels".format(results["agreement"], results["block_agreement"]))
+    print("HSV: {:.2f} ms/frame ({:.1f} Mpix/s)".format(results["hsv_ms_per_frame"], results["hsv_mpix_per_s"]))
+    print("LUT: {:.2f} ms/frame ({:.1f} Mpix/s)".format(results["lut_ms_per_frame"], results["lut_mpix_per_s"]))
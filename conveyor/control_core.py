@@ -0,0 +1,234 @@
+import asyncio
+import time
+import traceback
+
+from .instrumentation import instruments
+
+# ==============================================
+#               START OF TASK BUDGETS
+# ==============================================
+
+class TaskBudget:
+    """
+    How often one task runs and how long each run may take. Every run is
+    timed into the probe "task_<name>"; runs longer than `budget` count as
+    overruns. `period` may be a callable, asked again after every run; it
+    may return None to park a wakeable task until it is woken.
+    """
+
+    def __init__(self, name, period, budget):
+        self.name = name
+        self.period = period
+        self.budget = budget
+        self.probe = instruments.probe("task_" + name)
+        self.overruns = 0
+        self.worst = 0.0
+
+    def next_period(self):
+        return self.period() if callable(self.period) else self.period
+
+    def record(self, started, duration):
+        self.probe.add(duration, started)
+        if duration > self.budget:
+            self.overruns += 1
+            self.worst = max(self.worst, duration)
+
+    def stats(self):
+        stats = self.probe.stats()
+        period = self.next_period()
+        stats.update(period_ms=None if period is None else 1000 * period, budget_ms=1000 * self.budget, overruns=self.overruns)
+        return stats
+
+# ==============================================
+#               START OF CONTROL CORE
+# ==============================================
+
+class ControlCore:
+    """
+    One asyncio event loop running the controller as periodic tasks
+    (input, render, motor, sensor, telemetry...) plus a command task.
+
+    Task steps are plain functions (or coroutines) that do one pass and
+    return; the core paces them to their period without drifting and skips
+    ahead instead of bursting when one falls behind. A step must not block:
+    anything slow belongs on a thread or behind an await. The one exception
+    is an idle wait for input that asyncio can't see (pygame's event queue).
+    Nothing else on the loop runs while it lasts, so it waits at most
+    idle_timeout() and `interrupt` must cut it short; the step returns the
+    seconds it spent waiting, which are not charged to its budget.
+
+    Commands are coroutine functions run one at a time, in order, by the
+    command task. submit() may be called from any thread. After each command
+    every wakeable task runs, parked ones included, so its effects show at once.
+    """
+
+    def __init__(self):
+        self.budgets = {}
+        self.steps = {}
+        self.wakes = {}
+        # Loop time each task's next run is due, kept until it has run
+        self.deadlines = {}
+        self.commands = None
+        self.loop = None
+        self._stopped = None
+        self.running = False
+        self.command_budget = TaskBudget("commands", 0.0, 0.020)
+        # Called by submit() and wake(), from whatever thread, to end a blocking idle wait
+        self.interrupt = None
+
+    def add(self, name, step, period, budget, wakeable=False):
+        """Registers a periodic task. wakeable tasks can be run early with wake(name)."""
+        self.budgets[name] = TaskBudget(name, period, budget)
+        self.steps[name] = step
+        if wakeable:
+            self.wakes[name] = None
+
+    # ---------- From any thread ----------
+
+    def submit(self, command, *args):
+        """Queues command(*args) to run on the loop. Returns False if the core isn't running."""
+        loop = self.loop
+        if loop is None or not self.running:
+            return False
+        loop.call_soon_threadsafe(self.commands.put_nowait, (command, args))
+        if self.interrupt is not None:
+            self.interrupt()
+        return True
+
+    def wake(self, name):
+        """Runs a wakeable task now instead of at its next period."""
+        loop = self.loop
+        event = self.wakes.get(name)
+        if loop is not None and event is not None:
+            loop.call_soon_threadsafe(event.set)
+            if self.interrupt is not None:
+                self.interrupt()
+
+    def wake_all(self):
+        for name in self.wakes:
+            self.wake(name)
+
+    def stop(self):
+        self.running = False
+        loop = self.loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._stopped.set)
+
+    def idle_timeout(self, exclude):
+        """Seconds until a task other than `exclude` is due, 0 if one is overdue, None if none is waiting."""
+        loop = self.loop
+        due = [deadline for name, deadline in self.deadlines.items() if name != exclude]
+        if loop is None or not due:
+            return None
+        return max(0.0, min(due) - loop.time())
+
+    # ---------- Running ----------
+
+    def run(self):
+        """Runs every task until stop(). An exception in a task stops the core and is raised here."""
+        asyncio.run(self._main())
+
+    async def _main(self):
+        self.loop = asyncio.get_running_loop()
+        self.commands = asyncio.Queue()
+        self._stopped = asyncio.Event()
+        for name in self.wakes:
+            self.wakes[name] = asyncio.Event()
+        self.running = True
+
+        tasks = [asyncio.create_task(self._periodic(self.budgets[name], step), name=name) for name, step in self.steps.items()]
+        tasks.append(asyncio.create_task(self._run_commands(), name="commands"))
+        stopped = asyncio.create_task(self._stopped.wait())
+        try:
+            done, _ = await asyncio.wait(tasks + [stopped], return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task is not stopped and not task.cancelled() and task.exception() is not None:
+                    raise task.exception()
+        finally:
+            self.running = False
+            for task in tasks + [stopped]:
+                task.cancel()
+            await asyncio.gather(*tasks, stopped, return_exceptions=True)
+            self.loop = None
+
+    async def _periodic(self, budget, step):
+        loop = asyncio.get_running_loop()
+        wake = self.wakes.get(budget.name)
+        deadline = loop.time()
+        while self.running:
+            started = time.perf_counter()
+            result = step()
+            if asyncio.iscoroutine(result):
+                result = await result
+            duration = time.perf_counter() - started
+            if isinstance(result, float):
+                # Seconds the step spent in an idle wait, not working
+                duration -= result
+            budget.record(started, duration)
+
+            period = budget.next_period()
+            if period is None:
+                # Parked until woken
+                self.deadlines.pop(budget.name, None)
+                await wake.wait()
+                wake.clear()
+                deadline = loop.time()
+                continue
+            deadline += period
+            now = loop.time()
+            if deadline < now:
+                # Fell behind: start over from now rather than catch up in a burst
+                deadline = now
+            self.deadlines[budget.name] = deadline
+            if wake is None:
+                await asyncio.sleep(deadline - now)
+                continue
+            try:
+                await asyncio.wait_for(wake.wait(), deadline - now)
+                deadline = loop.time()
+            except asyncio.TimeoutError:
+                pass
+            wake.clear()
+
+    async def _run_commands(self):
+        while True:
+            command, args = await self.commands.get()
+            started = time.perf_counter()
+            try:
+                await command(*args)
+            except Exception:
+                # A failed command must not take the controller down with it
+                print("Command {} failed:".format(getattr(command, "__name__", command)))
+                traceback.print_exc()
+            self.command_budget.record(started, time.perf_counter() - started)
+            for wake in self.wakes.values():
+                wake.set()
+
+    # ---------- Reporting ----------
+
+    def stats(self):
+        stats = {name: budget.stats() for name, budget in self.budgets.items()}
+        stats["commands"] = self.command_budget.probe.stats()
+        return stats
+
+    def summary(self):
+        parts = []
+        for name, budget in self.budgets.items():
+            stats = budget.stats()
+            parts.append("{} {:.2f}/{:.1f} ms{}".format(
+                name, stats["mean_ms"], stats["budget_ms"],
+                " ({} over, worst {:.1f} ms)".format(budget.overruns, 1000 * budget.worst) if budget.overruns else ""))
+        return ", ".join(parts)
+
+def run_sync(command, *args):
+    """
+    Runs a command that never actually waits to completion without an
+    event loop, for synchronous drivers like the shift simulation.
+    """
+    coroutine = command(*args)
+    try:
+        coroutine.send(None)
+    except StopIteration as done:
+        return done.value
+    coroutine.close()
+    raise RuntimeError(command.__name__ + " waits; submit it to a running ControlCore instead")
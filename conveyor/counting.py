@@ -0,0 +1,96 @@
+import queue
+import time
+from collections import deque, namedtuple
+
+# ==============================================
+#             START OF BLOCK COUNTING
+# ==============================================
+
+# color is the block's integer code (a BlockColor), its index into the counts
+BlockEvent = namedtuple("BlockEvent", ["color", "timestamp"])
+
+# What the UI reads once per frame. colors follows the order given to BlockCounter.
+CountSnapshot = namedtuple("CountSnapshot", ["colors", "total", "rate_per_min"])
+
+class BlockCounter:
+    """
+    Integer block counts fed by timestamped detection events.
+
+    Any thread may call report(); events wait in a thread-safe queue until the
+    UI thread calls snapshot(), which applies them. Counts are only ever
+    changed on the consuming thread, so no locks are needed, and each event
+    is an O(1) update. The blocks/min rate is a sliding window over the event
+    timestamps (time.monotonic seconds).
+    """
+
+    def __init__(self, colors, rate_window=60.0, clock=time.monotonic):
+        self.colors = list(colors)
+        self.rate_window = rate_window
+        self.clock = clock
+
+        self.events = queue.SimpleQueue()
+        self.color_counts = [0] * len(self.colors)
+        self.total = 0
+        self.unknown = 0
+        self.recent = deque()
+
+        # Called with every applied BlockEvent, on the consuming thread
+        self.listeners = []
+
+    # ---------- Producer side, any thread ----------
+
+    def report(self, color, timestamp=None):
+        self.events.put(BlockEvent(color, self.clock() if timestamp is None else timestamp))
+
+    # ---------- Consumer side, UI thread ----------
+
+    def drain(self):
+        """Applies all pending events. Returns how many were applied."""
+        applied = 0
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+            self._apply(event)
+            applied += 1
+        return applied
+
+    def _apply(self, event):
+        i = event.color
+        if not 0 <= i < len(self.color_counts):
+            self.unknown += 1
+            return
+        self.color_counts[i] += 1
+        self.total += 1
+        self.recent.append(event.timestamp)
+        for listener in self.listeners:
+            listener(event)
+
+    def rate_per_min(self, now=None):
+        now = self.clock() if now is None else now
+        horizon = now - self.rate_window
+        recent = self.recent
+        while recent and recent[0] < horizon:
+            recent.popleft()
+        return len(recent) * 60.0 / self.rate_window
+
+    def snapshot(self):
+        self.drain()
+        return CountSnapshot(tuple(self.color_counts), self.total, self.rate_per_min())
+
+    def restore(self, color_counts, total):
+        """Seeds the counts, e.g. from a replayed production log."""
+        self.drain()
+        self.color_counts = list(color_counts)
+        self.total = total
+
+    def reset_colors(self):
+        # Anything detected before the reset belongs to the old counts
+        self.drain()
+        self.color_counts = [0] * len(self.colors)
+
+    def reset_total(self):
+        self.drain()
+        self.total = 0
+        self.recent.clear()
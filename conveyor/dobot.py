@@ -0,0 +1,471 @@
+import argparse
+import math
+import os
+import random
+import select
+import struct
+import termios
+import threading
+import time
+import tty
+from collections import deque, namedtuple
+
+from .arm_geometry import JUMP_HEIGHT, JUMP_Z_LIMIT, PICK, plan_pallets
+
+# ==============================================
+#               START OF PROTOCOL
+# ==============================================
+
+# DOBOT Magician communication protocol: every packet is
+#   AA AA | length | id | ctrl | params... | checksum
+# length counts id, ctrl and params; checksum makes id + ctrl + params sum to 0 mod 256.
+# ctrl bit 0 = write, bit 1 = queued. Queued commands answer with their uint64
+# queue index; the arm runs its queue in order and reports the last index done.
+# A queued command the arm has no room for is answered without an index.
+HEADER = b"\xaa\xaa"
+CTRL_WRITE = 0x01
+CTRL_QUEUED = 0x02
+
+CMD_GET_POSE = 10
+CMD_SUCTION_CUP = 62
+CMD_PTP_JUMP_PARAMS = 82
+CMD_PTP_COMMON_PARAMS = 83
+CMD_PTP = 84
+CMD_WAIT = 110
+CMD_QUEUE_START = 240
+CMD_QUEUE_STOP = 241
+CMD_QUEUE_CLEAR = 245
+CMD_QUEUE_INDEX = 246
+
+PTP_JUMP_XYZ = 0  # Lift to the jump height, travel, lower: what pick and place wants
+PTP_MOVL_XYZ = 2
+
+QUEUE_DEPTH = 32  # Commands the arm's queue holds; more are refused
+
+Command = namedtuple("Command", ["id", "params", "queued", "label"])
+
+def encode(cmd_id, params=b"", write=True, queued=False):
+    ctrl = (CTRL_WRITE if write else 0) | (CTRL_QUEUED if queued else 0)
+    checksum = -(cmd_id + ctrl + sum(params)) & 0xFF
+    return HEADER + bytes((2 + len(params), cmd_id, ctrl)) + params + bytes((checksum,))
+
+class PacketReader:
+    """Splits a byte stream into (id, ctrl, params) packets, skipping garbage and bad checksums."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.errors = 0
+
+    def feed(self, data):
+        self.buffer += data
+        packets = []
+        buffer = self.buffer
+        while True:
+            start = buffer.find(HEADER)
+            if start < 0:
+                del buffer[:max(0, len(buffer) - 1)]
+                return packets
+            if start:
+                del buffer[:start]
+            if len(buffer) < 3:
+                return packets
+            length = buffer[2]
+            if len(buffer) < 3 + length + 1:
+                return packets
+            body = bytes(buffer[3:3 + length])
+            checksum = buffer[3 + length]
+            if length < 2 or (sum(body) + checksum) & 0xFF:
+                self.errors += 1
+                del buffer[:2]
+                continue
+            del buffer[:3 + length + 1]
+            packets.append((body[0], body[1], body[2:]))
+
+def ptp(x, y, z, r=0.0, mode=PTP_JUMP_XYZ, label="move"):
+    return Command(CMD_PTP, struct.pack("<Bffff", mode, x, y, z, r), True, label)
+
+def suction(on, label=None):
+    return Command(CMD_SUCTION_CUP, struct.pack("<BB", 1, 1 if on else 0), True, label or ("grip" if on else "release"))
+
+def jump_params(height, z_limit):
+    return Command(CMD_PTP_JUMP_PARAMS, struct.pack("<ff", height, z_limit), True, "jump params")
+
+def common_params(velocity=100.0, acceleration=100.0):
+    return Command(CMD_PTP_COMMON_PARAMS, struct.pack("<ff", velocity, acceleration), True, "speed")
+
+# ==============================================
+#               START OF SERIAL LINK
+# ==============================================
+
+def open_serial(path, baud=termios.B115200):
+    """Opens a tty raw at 115200 8N1, as the Magician's USB serial port expects."""
+    fd = os.open(path, os.O_RDWR | os.O_NOCTTY)
+    tty.setraw(fd)
+    attrs = termios.tcgetattr(fd)
+    attrs[4] = attrs[5] = baud
+    termios.tcsetattr(fd, termios.TCSANOW, attrs)
+    return fd
+
+class DobotLink:
+    """
+    Request/response over the serial port. send() writes a whole batch of
+    packets in one go and then collects the replies, so a batch costs one
+    round trip instead of one per packet.
+    """
+
+    def __init__(self, path, timeout=2.0):
+        self.fd = open_serial(path)
+        self.timeout = timeout
+        self.reader = PacketReader()
+        self.pending = deque()
+        self.round_trips = 0
+        self.packets = 0
+
+    def send(self, commands):
+        """Sends (id, params, write, queued) tuples; returns each reply's params in order."""
+        os.write(self.fd, b"".join(encode(cmd_id, params, write, queued) for cmd_id, params, write, queued in commands))
+        self.round_trips += 1
+        self.packets += len(commands)
+
+        replies = []
+        deadline = time.monotonic() + self.timeout
+        while len(replies) < len(commands):
+            if not self.pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not select.select([self.fd], [], [], remaining)[0]:
+                    raise TimeoutError("DOBOT answered {} of {} packets".format(len(replies), len(commands)))
+                self.pending.extend(self.reader.feed(os.read(self.fd, 4096)))
+                continue
+            cmd_id, _, params = self.pending.popleft()
+            expected = commands[len(replies)][0]
+            if cmd_id != expected:
+                raise IOError("DOBOT answered command {} to {}".format(cmd_id, expected))
+            replies.append(params)
+        return replies
+
+    def close(self):
+        os.close(self.fd)
+
+class DobotArm:
+    """The few Magician commands the pipeline needs, on top of a DobotLink."""
+
+    def __init__(self, link):
+        self.link = link
+        self.last_queued = 0
+
+    def queue(self, commands):
+        """Queues Commands in one batch; returns their queue indices. Raises IOError if the arm refused any."""
+        replies = self.link.send([(command.id, command.params, True, command.queued) for command in commands])
+        refused = [command.label for command, reply in zip(commands, replies) if command.queued and len(reply) < 8]
+        if refused:
+            raise IOError("DOBOT queue full, refused: " + ", ".join(refused))
+        indices = [struct.unpack_from("<Q", reply)[0] if command.queued else None for command, reply in zip(commands, replies)]
+        queued = [index for index in indices if index is not None]
+        if queued:
+            self.last_queued = queued[-1]
+        return indices
+
+    def executed(self):
+        """Index of the last queued command the arm has finished."""
+        return struct.unpack_from("<Q", self.link.send([(CMD_QUEUE_INDEX, b"", False, False)])[0])[0]
+
+    def pose(self):
+        return struct.unpack_from("<4f", self.link.send([(CMD_GET_POSE, b"", False, False)])[0])
+
+    def start_queue(self):
+        self.link.send([(CMD_QUEUE_CLEAR, b"", True, False), (CMD_QUEUE_START, b"", True, False)])
+
+    def stop_queue(self):
+        self.link.send([(CMD_QUEUE_STOP, b"", True, False)])
+
+# ==============================================
+#             START OF PICK AND PLACE
+# ==============================================
+
+def block_commands(operation, pick=PICK):
+    """The queued moves for one block. Index 1 (grip) done means the belt can move again."""
+    x, y, z = operation.place
+    return [
+        ptp(*pick, label="pick"),
+        suction(True),
+        ptp(x, y, z, pick[3], label="place {} {}".format(operation.layer, operation.slot)),
+        suction(False),
+    ]
+
+GRIPPED = 1
+
+# ==============================================
+#               START OF PIPELINE
+# ==============================================
+
+class PalletPipeline:
+    """
+    Builds the pallets with the arm while the conveyor feeds it.
+
+    Each block's moves go to the arm's queue as one batch. As soon as the arm
+    has gripped a block, the conveyor starts jogging the next one to the pick
+    point while the arm carries the first to the pallet. The next batch is
+    queued as soon as the belt stops, so the arm's queue is usually not empty
+    and the arm doesn't stop between blocks. It never queues more than
+    `queue_depth` commands; should the arm still refuse one, queue() raises
+    rather than let the pallet go on with a block missing. If the arm
+    executes nothing for `stall_timeout` seconds (an alarm, a stall, an
+    unplugged cable), the wait raises TimeoutError instead of hanging.
+
+    jog(steps) starts a conveyor move and returns a handle with .done and
+    .wait(timeout), like StepperEngine.jog.
+    """
+
+    def __init__(self, arm, jog, operations, jog_steps, pick=PICK, poll=0.01, queue_depth=QUEUE_DEPTH, stall_timeout=10.0):
+        # A block's batch must fit in the queue, or wait_room waits for an index never queued
+        needed = max((len(block_commands(operation, pick)) for operation in operations), default=0)
+        if needed > queue_depth:
+            raise ValueError("queue_depth {} can't hold one block's {} commands".format(queue_depth, needed))
+        self.arm = arm
+        self.jog = jog
+        self.operations = operations
+        self.jog_steps = jog_steps
+        self.pick = pick
+        self.poll = poll
+        self.queue_depth = queue_depth
+        self.stall_timeout = stall_timeout
+        self.done_index = 0
+
+        self.placed = 0
+        self.batches = 0
+        self.polls = 0
+        self.belt_time = 0.0
+        self.belt_hidden = 0.0
+        self.elapsed = 0.0
+
+    def queue(self, commands):
+        self.batches += 1
+        return self.arm.queue(commands)
+
+    def poll_arm(self):
+        self.polls += 1
+        self.done_index = self.arm.executed()
+
+    def wait_executed(self, index):
+        # The deadline moves with every command the arm finishes, so only a stall runs it out
+        deadline = time.monotonic() + self.stall_timeout
+        while self.done_index < index:
+            if time.monotonic() >= deadline:
+                raise TimeoutError("DOBOT executed nothing for {:.1f} s, stuck at queue index {} waiting for {}".format(
+                    self.stall_timeout, self.done_index, index))
+            time.sleep(self.poll)
+            previous = self.done_index
+            self.poll_arm()
+            if self.done_index != previous:
+                deadline = time.monotonic() + self.stall_timeout
+
+    def wait_room(self, count):
+        # Never queue more than the arm holds; it would refuse the overflow
+        self.wait_executed(self.arm.last_queued + count - self.queue_depth)
+
+    def wait_belt(self, handle, started):
+        handle.wait()
+        moved = time.monotonic() - started
+        self.belt_time += moved
+        if handle.cancelled:
+            raise RuntimeError("conveyor jog was cancelled")
+        # Belt travel is free if the arm still had moves left when it stopped
+        self.poll_arm()
+        if self.done_index < self.arm.last_queued:
+            self.belt_hidden += moved
+
+    def run(self):
+        started = time.monotonic()
+        self.arm.start_queue()
+        self.queue([common_params(), jump_params(JUMP_HEIGHT, JUMP_Z_LIMIT)])
+        belt, belt_started = self.jog(self.jog_steps), time.monotonic()
+        for i, operation in enumerate(self.operations):
+            self.wait_belt(belt, belt_started)
+            commands = block_commands(operation, self.pick)
+            self.wait_room(len(commands))
+            indices = self.queue(commands)
+            if i + 1 < len(self.operations):
+                self.wait_executed(indices[GRIPPED])
+                belt, belt_started = self.jog(self.jog_steps), time.monotonic()
+            self.placed += 1
+        self.wait_executed(self.arm.last_queued)
+        self.elapsed = time.monotonic() - started
+        return self.stats()
+
+    def stats(self):
+        return {
+            "blocks": self.placed,
+            "seconds": self.elapsed,
+            "batches": self.batches,
+            "polls": self.polls,
+            "packets": self.arm.link.packets,
+            "belt_s": self.belt_time,
+            "belt_hidden_s": self.belt_hidden,
+        }
+
+# ==============================================
+#               START OF FAKE DOBOT
+# ==============================================
+
+class FakeDobot:
+    """
+    A Magician on a pseudo-terminal, for running the pipeline without an arm.
+    Open `path` like the real serial port.
+
+    Answers packets as the real arm does, refusals of queued commands beyond
+    `depth` included, and executes its queue on a second thread, each move
+    taking distance / `speed` plus the jump up and down, divided by
+    `time_scale`. Releases are recorded in `placed` as (x, y, z).
+    """
+
+    def __init__(self, speed=200.0, time_scale=1.0, depth=QUEUE_DEPTH):
+        self.speed = speed
+        self.time_scale = time_scale
+        self.depth = depth
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.path = os.ttyname(self.slave)
+
+        self.queue = deque()
+        self.condition = threading.Condition()
+        self.next_index = 1
+        self.executed = 0
+        self.pose = (200.0, 0.0, 0.0, 0.0)
+        self.jump = JUMP_HEIGHT
+        self.gripping = False
+        self.running = False
+        self.closed = False
+        self.placed = []
+        self.refused = 0
+        self.moves = 0
+
+        self.reader = PacketReader()
+        self.threads = [threading.Thread(target=target, name=name, daemon=True)
+                        for target, name in ((self._serve, "fake-dobot-serial"), (self._execute, "fake-dobot-queue"))]
+        for thread in self.threads:
+            thread.start()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        os.close(self.master)
+        os.close(self.slave)
+
+    def _serve(self):
+        while not self.closed:
+            try:
+                if not select.select([self.master], [], [], 0.1)[0]:
+                    continue
+                data = os.read(self.master, 4096)
+            except (OSError, ValueError):
+                return
+            replies = [self._answer(cmd_id, ctrl, params) for cmd_id, ctrl, params in self.reader.feed(data)]
+            if replies:
+                os.write(self.master, b"".join(replies))
+
+    def _answer(self, cmd_id, ctrl, params):
+        reply = b""
+        with self.condition:
+            if ctrl & CTRL_QUEUED:
+                if len(self.queue) >= self.depth:
+                    # No room: answered without a queue index
+                    self.refused += 1
+                else:
+                    self.queue.append((self.next_index, cmd_id, params))
+                    reply = struct.pack("<Q", self.next_index)
+                    self.next_index += 1
+                    self.condition.notify()
+            elif cmd_id == CMD_QUEUE_INDEX:
+                reply = struct.pack("<Q", self.executed)
+            elif cmd_id == CMD_GET_POSE:
+                reply = struct.pack("<8f", *self.pose, 0.0, 0.0, 0.0, 0.0)
+            elif cmd_id == CMD_QUEUE_START:
+                self.running = True
+                self.condition.notify()
+            elif cmd_id == CMD_QUEUE_STOP:
+                self.running = False
+            elif cmd_id == CMD_QUEUE_CLEAR:
+                self.queue.clear()
+        return encode(cmd_id, reply, ctrl & CTRL_WRITE, ctrl & CTRL_QUEUED)
+
+    def _execute(self):
+        while True:
+            with self.condition:
+                while not self.closed and not (self.running and self.queue):
+                    self.condition.wait()
+                if self.closed:
+                    return
+                index, cmd_id, params = self.queue[0]
+            time.sleep(self._duration(cmd_id, params) / self.time_scale)
+            with self.condition:
+                if self.queue and self.queue[0][0] == index:
+                    self.queue.popleft()
+                    self.executed = index
+
+    def _duration(self, cmd_id, params):
+        if cmd_id == CMD_PTP:
+            mode, x, y, z, r = struct.unpack("<Bffff", params)
+            lift = 2 * self.jump if mode == PTP_JUMP_XYZ else 0.0
+            distance = math.dist(self.pose[:3], (x, y, z)) + lift
+            self.pose = (x, y, z, r)
+            self.moves += 1
+            return distance / self.speed
+        if cmd_id == CMD_SUCTION_CUP:
+            _, suck = struct.unpack("<BB", params)
+            if self.gripping and not suck:
+                self.placed.append(self.pose[:3])
+            self.gripping = bool(suck)
+            return 0.1
+        if cmd_id == CMD_PTP_JUMP_PARAMS:
+            self.jump = struct.unpack("<ff", params)[0]
+        if cmd_id == CMD_WAIT:
+            return struct.unpack("<I", params)[0] / 1000
+        return 0.0
+
+if __name__ == "__main__":
+    from .hardware import QuietGPIOMock
+    from .motion_planner import STEP_SEQUENCES
+    from .pallets import Pallet
+    from .pin_group import ListOutputBackend, PinGroup
+    from .stepper import StepperEngine
+
+    parser = argparse.ArgumentParser(description="Palletize random layers with a DOBOT Magician fed by the conveyor (mocked coils).")
+    parser.add_argument("--port", help="the arm's serial port, e.g. /dev/ttyUSB0 (default: a fake DOBOT on a pty)")
+    parser.add_argument("--layers", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--jog-steps", type=int, default=400, help="conveyor steps from one block to the next")
+    parser.add_argument("--step-delay", type=float, default=0.002, help="seconds per conveyor step")
+    parser.add_argument("--time-scale", type=float, default=10.0, help="fake DOBOT and conveyor run this much faster than real time")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    pallet = Pallet(args.layers, 9)
+    pallet.fill(rng.choice(pallet.colors) for _ in range(args.layers * 9))
+
+    fake = None
+    scale = 1.0
+    path = args.port
+    if path is None:
+        scale = args.time_scale
+        fake = FakeDobot(time_scale=scale)
+        path = fake.path
+
+    coils = PinGroup([28, 23, 27, 22], ListOutputBackend(QuietGPIOMock()))
+    engine = StepperEngine(coils.write, coils.compile(STEP_SEQUENCES["full"]), delay=args.step_delay / scale).start()
+    link = DobotLink(path)
+    try:
+        operations = plan_pallets(pallet)
+        stats = PalletPipeline(DobotArm(link), engine.jog, operations, args.jog_steps).run()
+    finally:
+        engine.shutdown()
+        link.close()
+        if fake is not None:
+            fake.close()
+
+    print("{blocks} blocks in {seconds:.2f} s: {batches} command batches ({packets} packets), {polls} queue polls".format(**stats))
+    print("{belt_hidden_s:.2f} of {belt_s:.2f} s of belt travel fully hidden behind arm moves".format(**stats))
+    if fake is not None:
+        expected = [operation.place for operation in operations]
+        matches = all(math.dist(a, b) < 1e-3 for a, b in zip(fake.placed, expected)) and len(fake.placed) == len(expected)
+        print("Fake DOBOT: {} moves, {} placed where planned: {}, {} refused".format(fake.moves, len(fake.placed), matches, fake.refused))
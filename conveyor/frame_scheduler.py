@@ -0,0 +1,121 @@
+import time
+from collections import deque
+
+import pygame
+
+# ==============================================
+#             START OF FRAME SCHEDULER
+# ==============================================
+
+# Posted by wake() to cut a wait_events() short
+WAKE_EVENT = pygame.event.custom_type()
+
+# Events that count as operator input and wake the loop out of idle mode
+WAKE_EVENTS = (
+    WAKE_EVENT,
+    pygame.MOUSEBUTTONDOWN,
+    pygame.MOUSEBUTTONUP,
+    pygame.MOUSEMOTION,
+    pygame.KEYDOWN,
+    pygame.KEYUP,
+    pygame.VIDEORESIZE,
+    pygame.QUIT,
+)
+
+class FrameScheduler:
+    """
+    Decides the frame rate and keeps the frame stats.
+
+    While the conveyor is running, or for `idle_after` seconds after the last
+    input, frames are due at `target_fps`. Otherwise the UI drops to
+    `idle_fps` and blocks in pygame.event.wait (wait_events) so any input
+    wakes it at once.
+    """
+
+    def __init__(self, target_fps=30, idle_fps=2, idle_after=3.0, stats_window=120):
+        self.target_fps = target_fps
+        self.idle_fps = idle_fps
+        self.idle_after = idle_after
+        self.idle = False
+        self.frames = 0
+
+        now = time.perf_counter()
+        self.last_input = now
+        self.frame_start = now
+
+        # Rolling per-frame samples: (frame_time, busy_time) in seconds
+        self.samples = deque(maxlen=stats_window)
+        self.busy_time = 0.0
+
+    def wake(self):
+        """
+        Leaves idle mode immediately, e.g. after a programmatic state change,
+        and cuts short a wait_events() in progress. Safe from any thread.
+        """
+        self.last_input = time.perf_counter()
+        self.idle = False
+        pygame.event.post(pygame.event.Event(WAKE_EVENT))
+
+    def wait_events(self, timeout):
+        """
+        Blocks in pygame.event.wait until there is an event or `timeout`
+        seconds have passed, and returns the pending events. This holds up
+        the calling thread, so it's for the idle UI only.
+        """
+        # A timeout of 0 would mean no timeout at all
+        first = pygame.event.wait(max(1, int(1000 * timeout)))
+        events = [] if first.type == pygame.NOEVENT else [first]
+        events.extend(pygame.event.get())
+        return events
+
+    def note_input(self, events):
+        """Leaves idle mode if any of `events` is operator input. Returns True if it woke."""
+        for event in events:
+            if event.type in WAKE_EVENTS:
+                woke = self.idle
+                self.last_input = time.perf_counter()
+                self.idle = False
+                return woke
+        return False
+
+    def frame_period(self, active=False):
+        """
+        Seconds until the frame after this one, and decides idle mode.
+        `active` should be True while something on screen is changing on its own.
+        """
+        self.idle = not active and time.perf_counter() - self.last_input >= self.idle_after
+        return 1.0 / (self.idle_fps if self.idle else self.target_fps)
+
+    def begin_frame(self):
+        now = time.perf_counter()
+        if self.frames:
+            self.samples.append((now - self.frame_start, self.busy_time))
+        self.frame_start = now
+        self.frames += 1
+
+    def end_frame(self):
+        """Call after the display update to record the time spent working this frame."""
+        self.busy_time = time.perf_counter() - self.frame_start
+
+    def stats(self):
+        """Returns averaged timing over the stats window."""
+        if not self.samples:
+            return {"fps": 0.0, "frame_ms": 0.0, "busy_ms": 0.0, "load": 0.0, "idle": self.idle, "frames": self.frames}
+
+        frame_total = sum(sample[0] for sample in self.samples)
+        busy_total = sum(sample[1] for sample in self.samples)
+        count = len(self.samples)
+        return {
+            "fps": count / frame_total if frame_total else 0.0,
+            "frame_ms": 1000 * frame_total / count,
+            "busy_ms": 1000 * busy_total / count,
+            "load": busy_total / frame_total if frame_total else 0.0,
+            "idle": self.idle,
+            "frames": self.frames,
+        }
+
+    def summary(self):
+        stats = self.stats()
+        return "{:.1f} fps, {:.2f} ms/frame busy, {:.0%} loop load{}".format(
+            stats["fps"], stats["busy_ms"], stats["load"], " (idle)" if stats["idle"] else ""
+        )
@@ -0,0 +1,208 @@
+import os
+import random
+import threading
+
+from .pin_group import ListOutputBackend, MMapBackend, PerPinBackend, PinGroup
+
+# ==============================================
+#             START OF RPiGPIO MOCKS
+# ==============================================
+
+class GPIO_MOCK:
+    """Prints every GPIO call. Handy for watching pins by eye, far too slow to step a motor through."""
+
+    BCM = 'BCM'
+    OUT = 'OUT'
+    HIGH = True
+    LOW = False
+    BOARD = "BOARD"
+
+    @staticmethod
+    def setmode(mode):
+        print("[MOCK] GPIO mode set to " + mode)
+
+    @staticmethod
+    def setup(pin, mode):
+        print("[MOCK] Pin "+ str(pin) +" set as " + str(mode))
+
+    @staticmethod
+    def output(pin, state):
+        state_board = "HIGH" if state else "LOW"
+        print("[MOCK] Pin "+ str(pin) +" set to " + state_board)
+
+    @staticmethod
+    def cleanup():
+        print("[MOCK] GPIO cleanup called")
+
+class QuietGPIOMock:
+    """
+    RPi.GPIO stand-in that only remembers pin states. Supports the list form of
+    output() so the mock runs the same coil write path as the Pi.
+    """
+
+    BCM = 'BCM'
+    OUT = 'OUT'
+    HIGH = True
+    LOW = False
+    BOARD = "BOARD"
+
+    def __init__(self):
+        self.mode = None
+        self.pins = {}
+        self.writes = 0
+
+    def setmode(self, mode):
+        self.mode = mode
+
+    def setup(self, pin, mode):
+        self.pins[pin] = False
+
+    def output(self, pin, state):
+        self.writes += 1
+        if isinstance(pin, (list, tuple)):
+            if not isinstance(state, (list, tuple)):
+                state = [state] * len(pin)
+            for channel, value in zip(pin, state):
+                self.pins[channel] = bool(value)
+        else:
+            self.pins[pin] = bool(state)
+
+    def cleanup(self):
+        self.pins.clear()
+
+# ==============================================
+#             START OF BLOCK SENSORS
+# ==============================================
+
+class NoSensor:
+    """Reports nothing; used until real block detection is wired in."""
+
+    def fill_pallets(self, pallet):
+        pass
+
+    def attach(self, counter):
+        pass
+
+    def set_running(self, running):
+        pass
+
+    def close(self):
+        pass
+
+class PalletSensor:
+    """
+    Simulated sensor: fills the pallet with random colors and, while the
+    conveyor runs, reports its blocks one at a time every `interval`
+    seconds from its own thread, cycling through the layers. Pass a seeded
+    random.Random as rng to get the same pallets every run.
+    """
+
+    def __init__(self, interval=0.5, rng=None):
+        self.interval = interval
+        self.rng = rng or random.Random()
+        self.pallet = None
+        self.counter = None
+        self.running = threading.Event()
+        self.closed = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="pallet-sensor", daemon=True)
+
+    def fill_pallets(self, pallet):
+        self.pallet = pallet
+        colors = pallet.colors
+        pallet.fill(self.rng.choice(colors) for _ in range(pallet.layers * pallet.slots))
+
+    def attach(self, counter):
+        self.counter = counter
+        self.thread.start()
+
+    def set_running(self, running):
+        if running:
+            self.running.set()
+        else:
+            self.running.clear()
+
+    def close(self):
+        self.closed.set()
+        self.running.set()
+
+    def _blocks(self):
+        colors = self.pallet.colors
+        while True:
+            for code in self.pallet.blocks():
+                yield colors[code]
+
+    def _run(self):
+        blocks = self._blocks()
+        while not self.closed.is_set():
+            self.running.wait()
+            if self.closed.wait(self.interval):
+                return
+            if self.running.is_set():
+                self.counter.report(next(blocks))
+
+# ==============================================
+#               START OF BACKENDS
+# ==============================================
+
+class PiBackend:
+    """The real machine: RPi.GPIO on a Raspberry Pi."""
+
+    name = "pi"
+    caption = "Conveyor Controller"
+
+    def __init__(self, coil_output="list", camera=None, color_lut=None):
+        import RPi.GPIO as GPIO # type: ignore
+        self.gpio = GPIO
+        self.coil_output = coil_output
+        self.sensor = create_camera_sensor(camera, color_lut) if camera else NoSensor()
+
+    def create_coils(self, pins):
+        if self.coil_output == "mmap":
+            backend = MMapBackend()
+            backend.setup_outputs(pins)
+        else:
+            backend = ListOutputBackend(self.gpio)
+        return PinGroup(pins, backend)
+
+class MockBackend:
+    """
+    Runs anywhere. verbose=True swaps in the printing GPIO_MOCK; a camera
+    (usually a directory of recorded frames) replaces the simulated pallets.
+    """
+
+    name = "mock"
+    caption = "Conveyor Simulator"
+
+    def __init__(self, verbose=False, block_interval=0.5, camera=None, color_lut=None, seed=None):
+        self.gpio = GPIO_MOCK if verbose else QuietGPIOMock()
+        self.verbose = verbose
+        self.sensor = create_camera_sensor(camera, color_lut) if camera else PalletSensor(block_interval, random.Random(seed))
+
+    def create_coils(self, pins):
+        if self.verbose:
+            return PinGroup(pins, PerPinBackend(self.gpio))
+        return PinGroup(pins, ListOutputBackend(self.gpio))
+
+def create_camera_sensor(camera, color_lut=None):
+    """
+    camera is a V4L2 device path or a directory of recorded images. color_lut
+    is where the color lookup table is kept (built there on first use); without
+    it pixels go through HSV thresholds directly.
+    """
+    # NumPy is only needed once a camera is in use
+    from .vision import CameraSensor, open_source
+    return CameraSensor(open_source(camera), lut_path=color_lut)
+
+BACKENDS = {
+    "pi": PiBackend,
+    "mock": MockBackend,
+}
+
+def create_backend(name=None, coil_output="list", verbose_gpio=False, camera=None, color_lut=None, seed=None):
+    """Picks the backend by name, falling back to $CONVEYOR_BACKEND and then "pi". seed only affects the mock."""
+    name = name or os.environ.get("CONVEYOR_BACKEND") or "pi"
+    if name == "pi":
+        return PiBackend(coil_output=coil_output, camera=camera, color_lut=color_lut)
+    if name == "mock":
+        return MockBackend(verbose=verbose_gpio, camera=camera, color_lut=color_lut, seed=seed)
+    raise ValueError("Unknown backend " + repr(name) + ", expected one of " + ", ".join(sorted(BACKENDS)))
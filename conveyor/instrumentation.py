@@ -0,0 +1,193 @@
+import cProfile
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from array import array
+
+# ==============================================
+#               START OF SAMPLE RINGS
+# ==============================================
+
+class Probe:
+    """
+    Fixed-size ring of (start, duration) samples for one named section.
+
+    add() is a couple of array stores, so probes can stay on in production.
+    Each probe should have a single writing thread; readers may see a sample
+    mid-update, which only matters for a stats display.
+    """
+
+    def __init__(self, name, size=512):
+        self.name = name
+        self.size = size
+        self.starts = array("d", [0.0] * size)
+        self.durations = array("d", [0.0] * size)
+        self.index = 0
+        self.count = 0
+        self.thread = None
+
+    def add(self, duration, start=None):
+        if self.thread is None:
+            self.thread = threading.get_ident()
+        i = self.index
+        self.starts[i] = time.perf_counter() - duration if start is None else start
+        self.durations[i] = duration
+        self.index = (i + 1) % self.size
+        self.count += 1
+
+    def recent(self, limit=None):
+        """Durations oldest first, at most `limit` of them."""
+        n = min(self.count, self.size)
+        if limit is not None:
+            n = min(n, limit)
+        end = self.index
+        return [self.durations[(end - n + i) % self.size] for i in range(n)]
+
+    def samples(self):
+        """(start, duration) pairs oldest first."""
+        n = min(self.count, self.size)
+        end = self.index
+        return [(self.starts[(end - n + i) % self.size], self.durations[(end - n + i) % self.size]) for i in range(n)]
+
+    def stats(self):
+        values = sorted(self.recent())
+        if not values:
+            return {"count": self.count, "mean_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        return {
+            "count": self.count,
+            "mean_ms": 1000 * sum(values) / len(values),
+            "p95_ms": 1000 * values[min(len(values) - 1, int(0.95 * len(values)))],
+            "max_ms": 1000 * values[-1],
+        }
+
+class _Section:
+    """Reusable context manager that times into one probe. Not reentrant."""
+
+    __slots__ = ("probe", "start")
+
+    def __init__(self, probe):
+        self.probe = probe
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        start = self.start
+        self.probe.add(time.perf_counter() - start, start)
+        return False
+
+# ==============================================
+#             START OF INSTRUMENTATION
+# ==============================================
+
+class Instrumentation:
+    """
+    Named probes plus on-demand profiling.
+
+        with instruments.section("draw"): ...
+        @instruments.timed("update_stats")
+        instruments.mark("frame")   # time since the previous mark
+
+    dump_trace() writes the ring buffers as Chrome trace-event JSON (open in
+    Perfetto or chrome://tracing); start_profile()/stop_profile() capture a
+    cProfile .prof of the calling thread.
+    """
+
+    def __init__(self, size=512):
+        self.size = size
+        self.probes = {}
+        self.sections = {}
+        self.marks = {}
+        self.profiler = None
+        self.origin = time.perf_counter()
+
+    def probe(self, name):
+        probe = self.probes.get(name)
+        if probe is None:
+            probe = self.probes[name] = Probe(name, self.size)
+        return probe
+
+    def section(self, name):
+        section = self.sections.get(name)
+        if section is None:
+            section = self.sections[name] = _Section(self.probe(name))
+        return section
+
+    def timed(self, name=None):
+        def decorate(function):
+            probe = self.probe(name or function.__qualname__)
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    probe.add(time.perf_counter() - start, start)
+            return wrapper
+        return decorate
+
+    def record(self, name, duration):
+        self.probe(name).add(duration)
+
+    def mark(self, name):
+        """Records the interval since the last mark of this name, e.g. frame to frame."""
+        now = time.perf_counter()
+        last = self.marks.get(name)
+        self.marks[name] = now
+        if last is not None:
+            self.probe(name).add(now - last, last)
+
+    def stats(self):
+        return {name: probe.stats() for name, probe in self.probes.items()}
+
+    # ---------- Dumps ----------
+
+    def dump_trace(self, path):
+        """Chrome trace-event JSON of every sample still in the rings, one track per thread."""
+        events = []
+        for name, probe in list(self.probes.items()):
+            for start, duration in probe.samples():
+                events.append({
+                    "name": name, "ph": "X", "pid": os.getpid(), "tid": probe.thread or 0,
+                    "ts": 1e6 * (start - self.origin), "dur": 1e6 * duration,
+                })
+        events.sort(key=lambda event: event["ts"])
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return len(events)
+
+    @property
+    def profiling(self):
+        return self.profiler is not None
+
+    def start_profile(self):
+        if self.profiler is None:
+            # Lets `perf record` resolve Python frames too (Python 3.12+)
+            if hasattr(sys, "activate_stack_trampoline"):
+                try:
+                    sys.activate_stack_trampoline("perf")
+                except (ValueError, RuntimeError):
+                    pass
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def stop_profile(self, path):
+        """Stops the capture and writes it in pstats format (snakeviz, gprof2dot, pstats)."""
+        profiler = self.profiler
+        if profiler is None:
+            return None
+        profiler.disable()
+        self.profiler = None
+        if hasattr(sys, "deactivate_stack_trampoline"):
+            sys.deactivate_stack_trampoline()
+        profiler.dump_stats(path)
+        return path
+
+# Shared by the app and anything it drives, like text_cache
+instruments = Instrumentation()
@@ -0,0 +1,170 @@
+import time
+from array import array
+from collections import namedtuple
+
+# ==============================================
+#              START OF LINE METRICS
+# ==============================================
+
+MetricsSnapshot = namedtuple("MetricsSnapshot", [
+    "rates",          # {window minutes: blocks/min} for RATE_WINDOWS
+    "cycle_times",    # {color: average seconds between blocks of that color, or None}
+    "cycle_time",     # average seconds between any two blocks, or None
+    "utilization",    # fraction of the longest window the conveyor was running
+    "run_seconds",    # running time since the engine started
+    "idle_seconds",   # stopped time since the engine started
+])
+
+RATE_WINDOWS = (1, 5, 15)
+
+class MetricsEngine:
+    """
+    Line performance over a shift in constant memory.
+
+    Blocks and running time are accumulated into fixed-size ring buffers of
+    time buckets (bucket_seconds wide, covering the longest rate window), so
+    memory doesn't grow however long the shift runs. Cycle times are
+    exponentially weighted averages of the gap between detections.
+    """
+
+    def __init__(self, colors, bucket_seconds=5, windows=RATE_WINDOWS, smoothing=0.2, refresh=1.0, clock=time.monotonic):
+        self.colors = list(colors)
+        self.windows = windows
+        self.bucket_seconds = bucket_seconds
+        self.size = int(max(windows) * 60 // bucket_seconds) + 1
+        self.smoothing = smoothing
+        self.refresh = refresh
+        self.clock = clock
+
+        self.block_buckets = array("I", [0] * self.size)
+        self.run_buckets = array("d", [0.0] * self.size)
+
+        now = clock()
+        self.started = now
+        self.head = self._bucket(now)
+        self.last_update = now
+        self.running = False
+        self.run_seconds = 0.0
+
+        self.last_block = None
+        self.cycle_avg = None
+        self.last_color_block = [None] * len(self.colors)
+        self.color_cycle_avg = [None] * len(self.colors)
+
+        self._snapshot = None
+        self._snapshot_time = None
+
+    def _bucket(self, timestamp):
+        return int(timestamp // self.bucket_seconds)
+
+    def _advance(self, now):
+        """Brings the ring up to `now`, crediting running time to the buckets it fell in."""
+        if now <= self.last_update:
+            return
+
+        if self.running:
+            self.run_seconds += now - self.last_update
+            t = self.last_update
+            while t < now:
+                bucket = self._bucket(t)
+                bucket_end = min((bucket + 1) * self.bucket_seconds, now)
+                self._roll_to(bucket)
+                self.run_buckets[bucket % self.size] += bucket_end - t
+                t = bucket_end
+        self._roll_to(self._bucket(now))
+        self.last_update = now
+
+    def _roll_to(self, bucket):
+        if bucket <= self.head:
+            return
+        # Zero every bucket we skip over; at most one full lap
+        for b in range(max(self.head + 1, bucket - self.size + 1), bucket + 1):
+            self.block_buckets[b % self.size] = 0
+            self.run_buckets[b % self.size] = 0.0
+        self.head = bucket
+
+    # ---------- Inputs ----------
+
+    def record_block(self, color, timestamp=None):
+        now = self.clock() if timestamp is None else timestamp
+        self._advance(now)
+        bucket = self._bucket(now)
+        if bucket > self.head - self.size:
+            self.block_buckets[bucket % self.size] += 1
+
+        if self.last_block is not None:
+            self.cycle_avg = self._smooth(self.cycle_avg, now - self.last_block)
+        self.last_block = now
+
+        i = color
+        if 0 <= i < len(self.colors):
+            last = self.last_color_block[i]
+            if last is not None:
+                self.color_cycle_avg[i] = self._smooth(self.color_cycle_avg[i], now - last)
+            self.last_color_block[i] = now
+        self._snapshot = None
+
+    def on_block(self, event):
+        """BlockCounter listener."""
+        self.record_block(event.color, event.timestamp)
+
+    def set_running(self, running, now=None):
+        self._advance(self.clock() if now is None else now)
+        self.running = running
+        self._snapshot = None
+
+    def _smooth(self, average, sample):
+        if average is None:
+            return sample
+        return average + self.smoothing * (sample - average)
+
+    # ---------- Queries ----------
+
+    def _window(self, minutes, now):
+        """(blocks, run seconds, covered seconds) over the last `minutes`, current bucket included."""
+        buckets = min(self.size, int(minutes * 60 // self.bucket_seconds))
+        blocks = 0
+        run = 0.0
+        for b in range(self.head - buckets + 1, self.head + 1):
+            blocks += self.block_buckets[b % self.size]
+            run += self.run_buckets[b % self.size]
+        covered = min(now - (self.head - buckets + 1) * self.bucket_seconds, now - self.started)
+        return blocks, run, max(covered, 1e-9)
+
+    def rate(self, minutes, now=None):
+        """Blocks per minute over the last `minutes`."""
+        now = self.clock() if now is None else now
+        self._advance(now)
+        blocks, _, covered = self._window(minutes, now)
+        return blocks * 60.0 / covered
+
+    def utilization(self, minutes=None, now=None):
+        now = self.clock() if now is None else now
+        self._advance(now)
+        _, run, covered = self._window(minutes or max(self.windows), now)
+        return min(1.0, run / covered)
+
+    def snapshot(self, now=None):
+        """All metrics at once. Recomputed at most every `refresh` seconds unless something changed."""
+        now = self.clock() if now is None else now
+        if self._snapshot is not None and now - self._snapshot_time < self.refresh:
+            return self._snapshot
+
+        self._advance(now)
+        rates = {}
+        for minutes in self.windows:
+            blocks, _, covered = self._window(minutes, now)
+            rates[minutes] = blocks * 60.0 / covered
+        _, run, covered = self._window(max(self.windows), now)
+        total = max(now - self.started, 0.0)
+
+        self._snapshot = MetricsSnapshot(
+            rates=rates,
+            cycle_times=dict(zip(self.colors, self.color_cycle_avg)),
+            cycle_time=self.cycle_avg,
+            utilization=min(1.0, run / covered),
+            run_seconds=self.run_seconds,
+            idle_seconds=total - self.run_seconds,
+        )
+        self._snapshot_time = now
+        return self._snapshot
@@ -0,0 +1,238 @@
+import argparse
+import math
+import time
+from functools import lru_cache
+
+# ==============================================
+#             START OF STEP SEQUENCES
+# ==============================================
+
+# Coil states as [IN1, IN2, IN3, IN4] on the L293D. IN1/IN2 drive coil A and
+# IN3/IN4 coil B; every sequence turns the rotor the same way.
+STEP_SEQUENCES = {
+    # Two coils on at a time: full torque, one full step per entry
+    "full": [
+        [1, 0, 1, 0],  # Step 1
+        [0, 1, 1, 0],  # Step 2
+        [0, 1, 0, 1],  # Step 3
+        [1, 0, 0, 1],  # Step 4
+    ],
+    # Alternates one and two coils: twice the resolution, half a step per entry
+    "half": [
+        [1, 0, 0, 0],
+        [1, 0, 1, 0],
+        [0, 0, 1, 0],
+        [0, 1, 1, 0],
+        [0, 1, 0, 0],
+        [0, 1, 0, 1],
+        [0, 0, 0, 1],
+        [1, 0, 0, 1],
+    ],
+    # One coil on at a time: least current, least torque
+    "wave": [
+        [1, 0, 0, 0],
+        [0, 0, 1, 0],
+        [0, 1, 0, 0],
+        [0, 0, 0, 1],
+    ],
+}
+
+# ==============================================
+#              START OF SPEED RAMPS
+# ==============================================
+
+# Speeds are in sequence entries per second, accelerations in entries/s^2 and
+# jerk in entries/s^3.
+
+class TrapezoidRamp:
+    """Constant-acceleration ramp from v0 to v1."""
+
+    def __init__(self, v0, v1, accel, jerk=None):
+        self.v0 = v0
+        self.accel = accel
+        self.duration = (v1 - v0) / accel
+        self.distance = self.position(self.duration)
+
+    def position(self, t):
+        return self.v0 * t + self.accel * t * t / 2
+
+class SCurveRamp:
+    """Jerk-limited ramp from v0 to v1: accel rises, holds, then falls back to zero."""
+
+    def __init__(self, v0, v1, accel, jerk):
+        dv = v1 - v0
+        self.v0 = v0
+        self.jerk = jerk
+        if dv >= accel * accel / jerk:
+            self.t_jerk = accel / jerk
+            self.t_hold = dv / accel - self.t_jerk
+        else:
+            # Never reaches max acceleration
+            self.t_jerk = math.sqrt(dv / jerk) if dv > 0 else 0.0
+            self.t_hold = 0.0
+        self.peak_accel = jerk * self.t_jerk
+
+        # Velocity and position at the end of the first two phases
+        self.v_a = v0 + jerk * self.t_jerk ** 2 / 2
+        self.x_a = v0 * self.t_jerk + jerk * self.t_jerk ** 3 / 6
+        self.v_b = self.v_a + self.peak_accel * self.t_hold
+        self.x_b = self.x_a + self.v_a * self.t_hold + self.peak_accel * self.t_hold ** 2 / 2
+
+        self.duration = 2 * self.t_jerk + self.t_hold
+        self.distance = self.position(self.duration)
+
+    def position(self, t):
+        if t <= self.t_jerk:
+            return self.v0 * t + self.jerk * t ** 3 / 6
+        if t <= self.t_jerk + self.t_hold:
+            tau = t - self.t_jerk
+            return self.x_a + self.v_a * tau + self.peak_accel * tau * tau / 2
+        tau = min(t, self.duration) - self.t_jerk - self.t_hold
+        return self.x_b + self.v_b * tau + self.peak_accel * tau * tau / 2 - self.jerk * tau ** 3 / 6
+
+PROFILES = {
+    "trapezoid": TrapezoidRamp,
+    "scurve": SCurveRamp,
+}
+
+def _time_at(ramp, distance):
+    """Inverts ramp.position by bisection; position is monotonic because speed never drops below v0."""
+    low, high = 0.0, ramp.duration
+    for _ in range(48):
+        mid = (low + high) / 2
+        if ramp.position(mid) < distance:
+            low = mid
+        else:
+            high = mid
+    return high
+
+# ==============================================
+#              START OF MOTION PLANS
+# ==============================================
+
+class MotionPlan:
+    """Per-step delay table for one move. delays[k] is the wait after step k."""
+
+    def __init__(self, steps, delays, profile, peak_speed):
+        self.steps = steps
+        self.delays = delays
+        self.profile = profile
+        self.peak_speed = peak_speed
+        self.duration = sum(delays)
+
+    def timestamps(self):
+        """Planned time of every step, relative to the first."""
+        times = []
+        t = 0.0
+        for delay in self.delays:
+            times.append(t)
+            t += delay
+        return times
+
+@lru_cache(maxsize=32)
+def plan_move(steps, profile="trapezoid", max_speed=300.0, accel=1500.0, jerk=15000.0, start_speed=100.0):
+    """
+    Precomputes the delay table for a move of `steps` sequence entries that
+    starts and ends at start_speed. Short moves that can't reach max_speed get
+    a lower peak so the ramps still meet in the middle. Plans are cached, so
+    repeating the same jog costs nothing after the first time.
+    """
+    steps = abs(int(steps))
+    if steps == 0:
+        return MotionPlan(0, (), profile, 0.0)
+
+    ramp_class = PROFILES[profile]
+    start_speed = min(start_speed, max_speed)
+    ramp = ramp_class(start_speed, max_speed, accel, jerk)
+
+    if 2 * ramp.distance > steps:
+        # Bisect the highest peak speed whose up and down ramps fit in the move
+        low, high = start_speed, max_speed
+        for _ in range(48):
+            mid = (low + high) / 2
+            if 2 * ramp_class(start_speed, mid, accel, jerk).distance > steps:
+                high = mid
+            else:
+                low = mid
+        ramp = ramp_class(start_speed, low, accel, jerk)
+        peak = low
+    else:
+        peak = max_speed
+
+    ramp_end = ramp.distance
+    cruise_end = steps - ramp.distance
+    total = 2 * ramp.duration + (cruise_end - ramp_end) / peak
+
+    def time_at(position):
+        if position <= ramp_end:
+            return _time_at(ramp, position)
+        if position < cruise_end:
+            return ramp.duration + (position - ramp_end) / peak
+        return total - _time_at(ramp, steps - position)
+
+    # Step k happens at time_at(k); the wait after the last step mirrors the first
+    times = [time_at(k) for k in range(steps)]
+    times.append(times[-1] + (times[1] - times[0] if steps > 1 else 1.0 / start_speed))
+    delays = tuple(times[k + 1] - times[k] for k in range(steps))
+    return MotionPlan(steps, delays, profile, peak)
+
+def plan_fixed(steps, delay):
+    """The old step_motor timing, for comparison."""
+    steps = abs(int(steps))
+    return MotionPlan(steps, (delay,) * steps, "fixed", 1.0 / delay)
+
+# ==============================================
+#               START OF SIMULATION
+# ==============================================
+
+def simulate(plan, log=print, every=1):
+    """Logs the planned timestamp and instantaneous speed of every `every`-th step."""
+    for k, t in enumerate(plan.timestamps()):
+        if k % every == 0 or k == plan.steps - 1:
+            log("step {:5d}  t={:8.4f}s  {:7.1f} steps/s".format(k, t, 1.0 / plan.delays[k]))
+
+def run_live(plan, sequence):
+    """Runs a plan through StepperEngine with a recording coil writer and reports real timing."""
+    from .stepper import StepperEngine
+
+    stamps = []
+    engine = StepperEngine(lambda phase: stamps.append(time.perf_counter()), sequence).start()
+    engine.jog(plan.steps, delays=plan.delays).wait()
+    engine.shutdown()
+
+    planned = plan.timestamps()
+    errors = [abs((stamp - stamps[0]) - t) for stamp, t in zip(stamps, planned)]
+    return {
+        "steps": len(stamps),
+        "duration": stamps[-1] - stamps[0] + plan.delays[-1],
+        "error_avg_ms": 1000 * sum(errors) / len(errors),
+        "error_max_ms": 1000 * max(errors),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plan a conveyor jog and compare it against the fixed-delay step_motor timing.")
+    parser.add_argument("--steps", type=int, default=100, help="passes through the step sequence, as in step_motor(steps)")
+    parser.add_argument("--mode", choices=sorted(STEP_SEQUENCES), default="full")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="scurve")
+    parser.add_argument("--max-speed", type=float, default=300.0)
+    parser.add_argument("--accel", type=float, default=1500.0)
+    parser.add_argument("--jerk", type=float, default=15000.0)
+    parser.add_argument("--start-speed", type=float, default=100.0)
+    parser.add_argument("--fixed-delay", type=float, default=0.005, help="step_motor delay to compare against")
+    parser.add_argument("--every", type=int, default=25, help="log every Nth step")
+    parser.add_argument("--live", action="store_true", help="also run the plan through StepperEngine and measure it")
+    args = parser.parse_args()
+
+    sequence = STEP_SEQUENCES[args.mode]
+    entries = args.steps * len(sequence)
+    plan = plan_move(entries, args.profile, args.max_speed, args.accel, args.jerk, args.start_speed)
+    fixed = plan_fixed(entries, args.fixed_delay)
+
+    simulate(plan, every=args.every)
+    print("{} {} steps ({} mode), peak {:.1f} steps/s".format(args.profile, entries, args.mode, plan.peak_speed))
+    print("Planned: {:.3f}s  Fixed {}s delay: {:.3f}s  Saved: {:.1%}".format(
+        plan.duration, args.fixed_delay, fixed.duration, 1 - plan.duration / fixed.duration))
+
+    if args.live:
+        result = run_live(plan, sequence)
+        print("Live: {steps} steps in {duration:.3f}s, timing error avg {error_avg_ms:.3f} ms, max {error_max_ms:.3f} ms".format(**result))
@@ -0,0 +1,129 @@
+from array import array
+from enum import IntEnum
+
+# ==============================================
+#               START OF BLOCK COLORS
+# ==============================================
+
+class BlockColor(IntEnum):
+    """
+    Block colors as small integer codes. The code is the index into every
+    per-color list (counts, shared state, production log), so a detection
+    is counted with one integer index and no string comparison.
+    """
+
+    RED = 0
+    BLUE = 1
+    GREEN = 2
+    YELLOW = 3
+
+    @property
+    def label(self):
+        return self.name.capitalize()
+
+    # Print as the name ("Red"); a format spec ("{:d}") still formats the number
+    def __str__(self):
+        return self.label
+
+    def __format__(self, spec):
+        return self.label if not spec else int.__format__(self, spec)
+
+# ==============================================
+#                 START OF PALLETS
+# ==============================================
+
+EMPTY = 0xFF  # Code of a slot with no block yet
+
+class Pallet:
+    """
+    layers x slots grid of color codes in one array('B'): a byte per slot,
+    EMPTY where nothing is placed, layer-major so a layer is a contiguous
+    slice. Slots fill in order (add()); counts per color come from one
+    bincount over the bytes, with NumPy when it is installed.
+    """
+
+    def __init__(self, layers=3, slots=9, colors=tuple(BlockColor)):
+        self.layers = layers
+        self.slots = slots
+        self.colors = tuple(colors)
+        self.cells = array("B", [EMPTY]) * (layers * slots)
+        self.filled = 0
+
+    def __len__(self):
+        return self.filled
+
+    @property
+    def full(self):
+        return self.filled == len(self.cells)
+
+    def get(self, layer, slot):
+        code = self.cells[layer * self.slots + slot]
+        return None if code == EMPTY else self.colors[code]
+
+    def add(self, color):
+        """Puts a block in the next empty slot; a full pallet is cleared first. Returns (layer, slot)."""
+        if self.full:
+            self.clear()
+        index = self.filled
+        self.cells[index] = color
+        self.filled += 1
+        return divmod(index, self.slots)
+
+    def fill(self, colors):
+        for color in colors:
+            self.add(color)
+
+    def clear(self):
+        self.cells[:] = array("B", [EMPTY]) * len(self.cells)
+        self.filled = 0
+
+    def layer(self, layer):
+        """Codes of one layer's filled slots, as a memoryview (no copy)."""
+        start = layer * self.slots
+        return memoryview(self.cells)[start:start + max(0, min(self.slots, self.filled - start))]
+
+    def blocks(self):
+        """Codes of every placed block, in placement order."""
+        return memoryview(self.cells)[:self.filled]
+
+    def histogram(self, layer=None):
+        """Blocks of each color, in code order, for one layer or the whole pallet."""
+        codes = self.blocks() if layer is None else self.layer(layer)
+        return bincount(codes, len(self.colors))
+
+    def names(self, layer):
+        return [str(self.colors[code]) for code in self.layer(layer)]
+
+    # ---------- Between processes ----------
+
+    def tobytes(self):
+        return self.cells.tobytes()
+
+    def load(self, data):
+        if len(data) != len(self.cells):
+            raise ValueError("pallet is {} slots, got {}".format(len(self.cells), len(data)))
+        self.cells[:] = array("B", data)
+        first_empty = bytes(data).find(EMPTY)
+        self.filled = len(data) if first_empty < 0 else first_empty
+
+def bincount(codes, length):
+    """Occurrences of 0..length-1 among byte codes, ignoring EMPTY."""
+    np = _numpy()
+    if np:
+        return np.bincount(np.frombuffer(codes, dtype=np.uint8), minlength=length)[:length].tolist()
+    data = bytes(codes)
+    return [data.count(code) for code in range(length)]
+
+_np = None
+
+def _numpy():
+    # Imported on first use: NumPy is only required for the camera, and it
+    # would add noticeably to startup. Without it the bytes are counted directly.
+    global _np
+    if _np is None:
+        try:
+            import numpy
+            _np = numpy
+        except ImportError:
+            _np = False
+    return _np
@@ -0,0 +1,203 @@
+import argparse
+import mmap
+import os
+import time
+
+# ==============================================
+#              START OF GPIO BACKENDS
+# ==============================================
+
+# A backend turns a pin-group bitmask (bit i = pins[i]) into whatever it needs
+# to write those pins at once. compile() runs once per phase when the group is
+# set up; write() runs on every step and should do as little as possible.
+
+class ListOutputBackend:
+    """RPi.GPIO's list form: GPIO.output([pins], [values]) in one call."""
+
+    name = "list"
+
+    def __init__(self, gpio):
+        self.gpio = gpio
+
+    def compile(self, pins, mask):
+        return (list(pins), [(mask >> i) & 1 for i in range(len(pins))])
+
+    def write(self, payload):
+        self.gpio.output(payload[0], payload[1])
+
+class PerPinBackend:
+    """One output(pin, value) call per pin, as step_motor used to do. Works with GPIO_MOCK."""
+
+    name = "per-pin"
+
+    def __init__(self, gpio):
+        self.gpio = gpio
+
+    def compile(self, pins, mask):
+        return tuple((pin, (mask >> i) & 1) for i, pin in enumerate(pins))
+
+    def write(self, payload):
+        output = self.gpio.output
+        for pin, value in payload:
+            output(pin, value)
+
+class MMapBackend:
+    """
+    Writes the BCM283x GPSET0/GPCLR0 registers through /dev/gpiomem.
+
+    Setting and clearing are two register writes: all high pins go out in
+    one GPSET0 write and all low pins in the next GPCLR0 write. Each write
+    is atomic, but the interpreter runs between them, so for that short
+    window the coils show the new high pins and the old low ones.
+    Only bank 0 (BCM 0-31) is supported.
+    """
+
+    name = "mmap"
+
+    GPFSEL0 = 0x00 // 4
+    GPSET0 = 0x1C // 4
+    GPCLR0 = 0x28 // 4
+
+    def __init__(self, device="/dev/gpiomem"):
+        fd = os.open(device, os.O_RDWR | os.O_SYNC)
+        try:
+            self.mem = mmap.mmap(fd, 4096, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        finally:
+            os.close(fd)
+        self.words = memoryview(self.mem).cast("I")
+
+    @classmethod
+    def available(cls, device="/dev/gpiomem"):
+        return os.access(device, os.R_OK | os.W_OK)
+
+    def setup_outputs(self, pins):
+        """Sets each pin's function select to output (001)."""
+        for pin in pins:
+            index = self.GPFSEL0 + pin // 10
+            shift = (pin % 10) * 3
+            self.words[index] = (self.words[index] & ~(0b111 << shift)) | (0b001 << shift)
+
+    def compile(self, pins, mask):
+        set_word = 0
+        clear_word = 0
+        for i, pin in enumerate(pins):
+            if pin > 31:
+                raise ValueError("MMapBackend only drives BCM pins 0-31, got " + str(pin))
+            if (mask >> i) & 1:
+                set_word |= 1 << pin
+            else:
+                clear_word |= 1 << pin
+        return (set_word, clear_word)
+
+    def write(self, payload):
+        words = self.words
+        words[self.GPSET0] = payload[0]
+        words[self.GPCLR0] = payload[1]
+
+    def close(self):
+        self.words.release()
+        self.mem.close()
+
+# ==============================================
+#               START OF PIN GROUP
+# ==============================================
+
+def phase_mask(phase):
+    """[1, 0, 1, 0] -> 0b0101: bit i is pin i of the group."""
+    mask = 0
+    for i, value in enumerate(phase):
+        if value:
+            mask |= 1 << i
+    return mask
+
+class PinGroup:
+    """
+    A set of output pins written together. compile() turns a step sequence
+    into backend payloads ahead of time, so each step is a single write().
+    """
+
+    def __init__(self, pins, backend):
+        self.pins = tuple(pins)
+        self.backend = backend
+        self._payloads = {}
+
+    def payload(self, mask):
+        payload = self._payloads.get(mask)
+        if payload is None:
+            payload = self.backend.compile(self.pins, mask)
+            self._payloads[mask] = payload
+        return payload
+
+    def compile(self, sequence):
+        return [self.payload(phase_mask(phase)) for phase in sequence]
+
+    def write(self, payload):
+        self.backend.write(payload)
+
+    def write_mask(self, mask):
+        self.backend.write(self.payload(mask))
+
+# ==============================================
+#              START OF MICRO-BENCHMARK
+# ==============================================
+
+class _NullGPIO:
+    """Accepts RPi.GPIO-style output calls and does nothing, to time the Python side alone."""
+
+    @staticmethod
+    def output(pin, state):
+        pass
+
+def benchmark(group, sequence, steps=20000):
+    """Writes `steps` phases back to back and returns achievable steps per second."""
+    payloads = group.compile(sequence)
+    count = len(payloads)
+    write = group.write
+    start = time.perf_counter()
+    for i in range(steps):
+        write(payloads[i % count])
+    return steps / (time.perf_counter() - start)
+
+def _import_gpio():
+    try:
+        import RPi.GPIO as GPIO # type: ignore
+    except (ImportError, RuntimeError):
+        return None
+    return GPIO
+
+def available_backends(GPIO=None):
+    """(label, backend) for everything that can run on this machine."""
+    backends = [
+        ("per-pin, null GPIO", PerPinBackend(_NullGPIO)),
+        ("list, null GPIO", ListOutputBackend(_NullGPIO)),
+    ]
+    if GPIO is not None:
+        backends.append(("per-pin, RPi.GPIO", PerPinBackend(GPIO)))
+        backends.append(("list, RPi.GPIO", ListOutputBackend(GPIO)))
+    if MMapBackend.available():
+        backends.append(("mmap, /dev/gpiomem", MMapBackend()))
+    return backends
+
+if __name__ == "__main__":
+    from .motion_planner import STEP_SEQUENCES
+
+    parser = argparse.ArgumentParser(description="Compare achievable step rates of the coil output backends.")
+    parser.add_argument("--pins", type=int, nargs=4, default=[28, 23, 27, 22], help="BCM pins IN1..IN4")
+    parser.add_argument("--steps", type=int, default=20000)
+    parser.add_argument("--mode", choices=sorted(STEP_SEQUENCES), default="full")
+    args = parser.parse_args()
+
+    sequence = STEP_SEQUENCES[args.mode]
+    GPIO = _import_gpio()
+    if GPIO is not None:
+        GPIO.setmode(GPIO.BCM)
+        for pin in args.pins:
+            GPIO.setup(pin, GPIO.OUT)
+    backends = available_backends(GPIO)
+
+    for label, backend in backends:
+        rate = benchmark(PinGroup(args.pins, backend), sequence, args.steps)
+        print("{:22s} {:12,.0f} steps/s".format(label, rate))
+
+    if GPIO is not None:
+        GPIO.cleanup()
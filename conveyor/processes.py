@@ -0,0 +1,320 @@
+import multiprocessing
+import queue
+import signal
+import threading
+import time
+
+from .hardware import create_backend
+from .pallets import Pallet
+from .shared_state import MOTOR_STATES, SharedState
+from .stepper import StepperEngine
+
+# ==============================================
+#             START OF MOTION PROCESS
+# ==============================================
+
+def motion_main(backend_name, options, pins, sequence, commands, state_name):
+    """
+    Owns the coil pins and the StepperEngine. Executes commands from the UI
+    and publishes motor position, state, timing and finished jogs into the
+    motor record of the shared state, which only this process writes.
+    """
+    # Ctrl-C reaches the whole process group; the UI shuts this process down in order
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    state = SharedState.attach(state_name)
+    backend = create_backend(backend_name, **options)
+    GPIO = backend.gpio
+    GPIO.setmode(GPIO.BCM)
+    for pin in pins:
+        GPIO.setup(pin, GPIO.OUT)
+    coils = backend.create_coils(pins)
+    engine = StepperEngine(coils.write, coils.compile(sequence)).start()
+
+    jogs = []
+    try:
+        while True:
+            try:
+                command = commands.get(timeout=0.02)
+            except queue.Empty:
+                command = None
+
+            if command is not None:
+                kind, arg = command
+                if kind == "shutdown":
+                    break
+                if kind == "jog":
+                    jog_id, steps, delays = arg
+                    jogs.append((jog_id, engine.jog(steps, delays=delays)))
+                elif kind == "run":
+                    engine.run(arg)
+                elif kind == "stop":
+                    engine.stop()
+                elif kind == "speed":
+                    engine.set_speed(arg)
+                elif kind == "reset_timing":
+                    engine.reset_timing()
+
+            finished = []
+            while jogs and jogs[0][1].done:
+                finished.append(jogs.pop(0))
+            # Status before the jogs: whoever sees a jog finished also sees its steps
+            state.publish_stepper(engine.status())
+            for jog_id, handle in finished:
+                if handle.cancelled:
+                    state.update_motor(jog_finished=jog_id)
+                else:
+                    state.update_motor(jog_finished=jog_id, jog_completed=jog_id)
+    finally:
+        engine.shutdown()
+        GPIO.cleanup()
+        state.close()
+
+class RemoteMotionHandle:
+    """MotionHandle for a jog running in the motion process, answered from the shared state."""
+
+    def __init__(self, jog_id, steps, state):
+        self.jog_id = jog_id
+        self.steps = abs(steps)
+        self.state = state
+
+    @property
+    def done(self):
+        return self.state.read_motor().jog_finished >= self.jog_id
+
+    @property
+    def cancelled(self):
+        motor = self.state.read_motor()
+        return motor.jog_finished >= self.jog_id and motor.jog_completed < self.jog_id
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.done:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+def exit_fault(process, closing):
+    """Why a child process is gone, or None while it runs or once it was shut down on purpose."""
+    if closing or process.exitcode is None:
+        return None
+    return "{} exited with code {}".format(process.name, process.exitcode)
+
+class RemoteStepper:
+    """
+    Same UI-side interface as StepperEngine, forwarding to the motion
+    process. If that process dies, status() reports a fault from then on.
+    """
+
+    def __init__(self, commands, state, process):
+        self.commands = commands
+        self.state = state
+        self.process = process
+        self.next_jog_id = 1
+        self.closing = False
+
+    @property
+    def fault(self):
+        return exit_fault(self.process, self.closing)
+
+    def jog(self, steps, on_done=None, delays=None):
+        if on_done is not None:
+            raise ValueError("on_done callbacks can't cross into the motion process")
+        jog_id = self.next_jog_id
+        self.next_jog_id += 1
+        self.commands.put(("jog", (jog_id, steps, tuple(delays) if delays is not None else None)))
+        return RemoteMotionHandle(jog_id, steps, self.state)
+
+    def run(self, direction=1):
+        self.commands.put(("run", 1 if direction >= 0 else -1))
+
+    def stop(self):
+        self.commands.put(("stop", None))
+
+    def set_speed(self, delay):
+        self.commands.put(("speed", delay))
+
+    def reset_timing(self):
+        self.commands.put(("reset_timing", None))
+
+    def shutdown(self, timeout=2.0):
+        self.closing = True
+        if self.process.is_alive():
+            self.commands.put(("shutdown", None))
+            self.process.join(timeout)
+
+    @property
+    def busy(self):
+        return self.fault is None and MOTOR_STATES[self.state.read_motor().state] in ("jogging", "running")
+
+    def status(self):
+        motor = self.state.read_motor()
+        fault = self.fault
+        if fault is not None:
+            motor = motor._replace(state=MOTOR_STATES.index("fault"), error=fault)
+        return {
+            "state": MOTOR_STATES[motor.state],
+            "position": motor.position,
+            "direction": motor.direction,
+            "delay": motor.delay,
+            "remaining": motor.remaining,
+            "late_avg_ms": motor.late_avg_ms,
+            "late_max_ms": motor.late_max_ms,
+            "error": motor.error or None,
+        }
+
+# ==============================================
+#             START OF SENSING PROCESS
+# ==============================================
+
+class QueueReporter:
+    """Stands in for the BlockCounter inside the sensing process."""
+
+    def __init__(self, events):
+        self.events = events
+
+    def report(self, color, timestamp=None):
+        self.events.put(("block", (color, time.monotonic() if timestamp is None else timestamp)))
+
+def sensing_main(backend_name, options, pallet_shape, commands, events):
+    """
+    Owns the block sensor (camera or simulation). Block events go back to
+    the UI over `events`; time.monotonic is system wide, so their
+    timestamps stay comparable across processes.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    backend = create_backend(backend_name, **options)
+    sensor = backend.sensor
+    pallet = Pallet(*pallet_shape)
+    sensor.fill_pallets(pallet)
+    sensor.attach(QueueReporter(events))
+
+    # The whole pallet is layers x slots bytes, cheap to send whenever it changes
+    sent = pallet.tobytes()
+    events.put(("pallets", sent))
+    try:
+        while True:
+            try:
+                kind, arg = commands.get(timeout=0.25)
+            except queue.Empty:
+                kind = None
+            if kind == "shutdown":
+                break
+            if kind == "running":
+                sensor.set_running(arg)
+
+            current = pallet.tobytes()
+            if current != sent:
+                events.put(("pallets", current))
+                sent = current
+    finally:
+        sensor.close()
+
+class RemoteSensor:
+    """Sensor interface in the UI process for a sensor running in the sensing process."""
+
+    def __init__(self, commands, events, process):
+        self.commands = commands
+        self.events = events
+        self.process = process
+        self.pallet = None
+        self.on_filled = None
+        self.counter = None
+        self.closing = False
+        self.thread = threading.Thread(target=self._forward, name="sensing-events", daemon=True)
+
+    @property
+    def fault(self):
+        return exit_fault(self.process, self.closing)
+
+    def fill_pallets(self, pallet, on_filled=None):
+        """
+        The sensing process fills its own pallet and sends it whenever it
+        changes. Each copy is loaded into `pallet` on the events thread, and
+        on_filled() is called there once the first has arrived.
+        """
+        self.pallet = pallet
+        self.on_filled = on_filled
+
+    def attach(self, counter):
+        self.counter = counter
+        self.thread.start()
+
+    def set_running(self, running):
+        self.commands.put(("running", running))
+
+    def close(self, timeout=2.0):
+        self.closing = True
+        if self.process.is_alive():
+            self.commands.put(("shutdown", None))
+            self.process.join(timeout)
+
+    def _forward(self):
+        while True:
+            try:
+                kind, arg = self.events.get()
+            except (EOFError, OSError):
+                return
+            if kind == "block":
+                self.counter.report(*arg)
+            elif kind == "pallets":
+                self.pallet.load(arg)
+                if self.on_filled is not None:
+                    callback, self.on_filled = self.on_filled, None
+                    callback()
+
+# ==============================================
+#              START OF PROCESS GROUP
+# ==============================================
+
+class ProcessGroup:
+    """
+    Starts the motion and sensing processes. They are spawned, not forked,
+    so they start clean of pygame and the UI's threads; each builds its own
+    backend from (backend_name, options), and only the sensing process opens
+    `camera`. The motion process attaches to `state` by name and owns its
+    motor record.
+
+    Nothing tells the UI when a child dies, so it calls check() periodically.
+    """
+
+    def __init__(self, backend_name, options, pins, sequence, pallet, state, camera=None):
+        context = multiprocessing.get_context("spawn")
+        options = dict(options, camera=None)
+
+        motion_commands = context.Queue()
+        motion = context.Process(target=motion_main, name="conveyor-motion", daemon=True,
+                                 args=(backend_name, options, list(pins), sequence, motion_commands, state.name))
+        sensing_commands = context.Queue()
+        sensing_events = context.Queue()
+        sensing = context.Process(target=sensing_main, name="conveyor-sensing", daemon=True,
+                                  args=(backend_name, dict(options, camera=camera), (pallet.layers, pallet.slots), sensing_commands, sensing_events))
+        motion.start()
+        sensing.start()
+
+        self.state = state
+        self.stepper = RemoteStepper(motion_commands, state, motion)
+        self.sensor = RemoteSensor(sensing_commands, sensing_events, sensing)
+        self.reported = set()
+
+    def check(self):
+        """
+        Messages for children found dead since the last call. A dead motion
+        process can't write its motor record any more, so this one marks it
+        as faulted there for everyone reading the shared state.
+        """
+        faults = []
+        for part in (self.stepper, self.sensor):
+            fault = part.fault
+            if fault is None or part in self.reported:
+                continue
+            self.reported.add(part)
+            faults.append(fault)
+            if part is self.stepper:
+                self.state.motor = self.state.read_motor()
+                self.state.update_motor(state=MOTOR_STATES.index("fault"), error=fault)
+        return faults
+
+    def shutdown(self):
+        self.stepper.shutdown()
+        self.sensor.close()
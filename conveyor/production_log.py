@@ -0,0 +1,171 @@
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import namedtuple
+
+# ==============================================
+#            START OF PRODUCTION LOG
+# ==============================================
+
+# File layout: a 16 byte header, then fixed 16 byte records
+#   timestamp  float64  wall clock seconds
+#   kind       uint8    one of the record kinds below
+#   code       uint8    block color index for BLOCK records
+#   (pad)      2 bytes
+#   value      int32    steps for JOG records
+MAGIC = b"CONVLOG1"
+HEADER = struct.Struct("<8sII")
+RECORD = struct.Struct("<dBBxxi")
+VERSION = 1
+
+BLOCK = 1
+START = 2
+STOP = 3
+JOG = 4
+RESET_COUNT = 5
+RESET_TOTAL = 6
+RESET_TIME = 7
+
+ShiftTotals = namedtuple("ShiftTotals", [
+    "colors",        # per color index counts since the last RESET_COUNT
+    "total",         # blocks since the last RESET_TOTAL
+    "run_seconds",   # running time since the last RESET_TIME
+    "running",       # True if the log ends mid-run (e.g. after a crash)
+    "jogs",
+    "records",
+    "last_timestamp",
+])
+
+class ProductionLog:
+    """
+    Append-only event log that survives exits, resets and crashes.
+
+    append() only packs a record into a memory buffer. A background thread
+    writes the buffer out and fsyncs it every `sync_interval` seconds, so the
+    SD card sees one small write per interval rather than one per block. At
+    most `sync_interval` seconds of events can be lost on power failure.
+    Records without a timestamp are stamped with clock().
+    """
+
+    def __init__(self, path, sync_interval=2.0, clock=time.time):
+        self.path = path
+        self.sync_interval = sync_interval
+        self.clock = clock
+
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        if not new:
+            _check_header(path)
+        self.file = open(path, "ab")
+        if new:
+            self.file.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+            self._sync()
+        else:
+            _trim_partial_record(self.file)
+
+        self.buffer = bytearray()
+        self.lock = threading.Lock()
+        self.closed = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="production-log", daemon=True)
+        self.thread.start()
+
+    def append(self, kind, code=0, value=0, timestamp=None):
+        record = RECORD.pack(self.clock() if timestamp is None else timestamp, kind, code, value)
+        with self.lock:
+            self.buffer += record
+
+    def flush(self):
+        with self.lock:
+            data = bytes(self.buffer)
+            self.buffer.clear()
+        if data:
+            self.file.write(data)
+            self._sync()
+
+    def _sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def _run(self):
+        while not self.closed.wait(self.sync_interval):
+            self.flush()
+
+    def close(self):
+        self.closed.set()
+        self.thread.join()
+        self.flush()
+        self.file.close()
+
+def _check_header(path):
+    with open(path, "rb") as f:
+        header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise ValueError(path + " is too short to be a production log")
+    magic, version, record_size = HEADER.unpack(header)
+    if magic != MAGIC or record_size != RECORD.size:
+        raise ValueError(path + " is not a version " + str(VERSION) + " production log")
+
+def _trim_partial_record(file):
+    """Drops half a record left at the end by a crash mid-write."""
+    size = file.seek(0, os.SEEK_END)
+    extra = (size - HEADER.size) % RECORD.size
+    if extra:
+        file.truncate(size - extra)
+        file.seek(size - extra)
+
+# ==============================================
+#                START OF REPLAY
+# ==============================================
+
+def replay(path, color_count=4):
+    """
+    Rebuilds shift totals from the log through mmap. Returns None if there is
+    no log yet. A run left open at the end is counted up to the last record.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) <= HEADER.size:
+        return None
+    _check_header(path)
+
+    colors = [0] * color_count
+    total = 0
+    run_seconds = 0.0
+    run_start = None
+    jogs = 0
+    last_time = None
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mem:
+        end = HEADER.size + (len(mem) - HEADER.size) // RECORD.size * RECORD.size
+        view = memoryview(mem)[HEADER.size:end]
+        records = len(view) // RECORD.size
+        try:
+            for timestamp, kind, code, value in RECORD.iter_unpack(view):
+                last_time = timestamp
+                if kind == BLOCK:
+                    if code < color_count:
+                        colors[code] += 1
+                    total += 1
+                elif kind == START:
+                    if run_start is None:
+                        run_start = timestamp
+                elif kind == STOP:
+                    if run_start is not None:
+                        run_seconds += timestamp - run_start
+                        run_start = None
+                elif kind == JOG:
+                    jogs += 1
+                elif kind == RESET_COUNT:
+                    colors = [0] * color_count
+                elif kind == RESET_TOTAL:
+                    total = 0
+                elif kind == RESET_TIME:
+                    run_seconds = 0.0
+                    if run_start is not None:
+                        run_start = timestamp
+        finally:
+            view.release()
+
+    running = run_start is not None
+    if running:
+        run_seconds += last_time - run_start
+    return ShiftTotals(tuple(colors), total, run_seconds, running, jogs, records, last_time)
@@ -0,0 +1,70 @@
+import pygame
+
+# ==============================================
+#           START OF DIRTY-RECT RENDERER
+# ==============================================
+
+class Renderer:
+    """
+    Retained-mode renderer for drawn_assets.
+
+    The background is composed once into a cached surface. Each frame only the
+    widgets that report a change are erased (from the cache) and redrawn, and
+    draw() returns the list of screen rects that need to be pushed with
+    pygame.display.update().
+    """
+
+    def __init__(self, screen, background, background_rect, assets):
+        self.screen = screen
+        self.assets = assets
+        self.background = None
+        self.full_redraw = True
+        self.set_background(background, background_rect)
+
+    def set_background(self, image, image_rect):
+        """Caches the background composed at screen size and in the display's pixel format."""
+        cache = pygame.Surface(self.screen.get_size()).convert(self.screen)
+        cache.blit(image, image_rect)
+        self.background = cache
+        self.background_rect = image_rect
+        self.invalidate()
+
+    def invalidate(self):
+        """Forces the next draw to repaint the whole screen (first frame, resize, expose)."""
+        self.full_redraw = True
+
+    def draw(self):
+        if self.full_redraw:
+            self.full_redraw = False
+            self.screen.blit(self.background, (0, 0))
+            for asset in self.assets:
+                asset.render(self.screen)
+            return [self.screen.get_rect()]
+
+        dirty = [asset for asset in self.assets if asset.needs_redraw()]
+        if not dirty:
+            return []
+
+        # Erasing a widget wipes anything overlapping it, so pull overlapping
+        # widgets into the redraw until the set stops growing.
+        erase = [asset.drawn_rect for asset in dirty if asset.drawn_rect is not None]
+        grew = True
+        while grew:
+            grew = False
+            for asset in self.assets:
+                if asset in dirty or asset.drawn_rect is None:
+                    continue
+                if asset.drawn_rect.collidelist(erase) != -1:
+                    dirty.append(asset)
+                    erase.append(asset.drawn_rect)
+                    grew = True
+
+        for rect in erase:
+            self.screen.blit(self.background, rect, rect)
+
+        updated = list(erase)
+        # Keep drawn_assets order so stacking matches a full redraw
+        for asset in self.assets:
+            if asset in dirty:
+                updated.append(asset.render(self.screen))
+        return updated
@@ -0,0 +1,64 @@
+import time
+from collections import namedtuple
+
+# ==============================================
+#               START OF SELF-TEST
+# ==============================================
+
+CheckResult = namedtuple("CheckResult", ["name", "ok", "detail"])
+
+def check_stepper(stepper, steps=50, timeout=5.0, late_fraction=0.25):
+    """
+    Jogs `steps` forward and back and checks both moves finish, the motor
+    ends where it started and steps were on time. Timing is judged on these
+    two jogs only, not on whatever the stepper did before. A jog cancelled by
+    the operator (start/stop/jog) reports as interrupted.
+
+    Steps fail the timing check when they are late by more than
+    `late_fraction` of the step delay on average, i.e. the belt runs that
+    much slower than set. The worst single step is only reported: one
+    deschedule (CPython switches threads every 5 ms) delays a step but loses
+    none, as the engine never bursts to catch up.
+    """
+    results = []
+    start = stepper.status()["position"]
+    stepper.reset_timing()
+    for direction in (1, -1):
+        handle = stepper.jog(direction * steps)
+        if not handle.wait(timeout):
+            results.append(CheckResult("stepper", False, "{} step jog still running after {:.0f} s".format(direction * steps, timeout)))
+            return results
+        if handle.cancelled:
+            results.append(CheckResult("stepper", False, "interrupted"))
+            return results
+
+    status = stepper.status()
+    if status["state"] == "fault":
+        results.append(CheckResult("stepper", False, "fault: " + str(status.get("error"))))
+        return results
+    moved = status["position"] - start
+    results.append(CheckResult("stepper", moved == 0, "{} steps each way, ended {:+d} from start".format(steps, moved)))
+    limit_ms = late_fraction * 1000 * status["delay"]
+    results.append(CheckResult("step timing", status["late_avg_ms"] <= limit_ms,
+                               "late avg {:.2f} ms (limit {:.1f}), max {:.2f} ms".format(status["late_avg_ms"], limit_ms, status["late_max_ms"])))
+    return results
+
+def check_sensor(sensor, wait=1.0):
+    """Cameras must deliver frames; other sensors only have to be there."""
+    stats = getattr(sensor, "stats", None)
+    if stats is None:
+        return [CheckResult("sensor", True, type(sensor).__name__)]
+    before = stats()["captured"]
+    time.sleep(wait)
+    captured = stats()["captured"] - before
+    return [CheckResult("sensor", captured > 0, "{} frames in {:.1f} s".format(captured, wait))]
+
+def run_self_test(stepper, sensor, steps=50, timeout=5.0, late_fraction=0.25):
+    """Runs every check. Safe to call from a background thread while the UI runs."""
+    results = []
+    results.extend(check_stepper(stepper, steps, timeout, late_fraction))
+    results.extend(check_sensor(sensor))
+    return results
+
+def format_results(results):
+    return "\n".join("  {:12s} {}  {}".format(result.name, "OK  " if result.ok else "FAIL", result.detail) for result in results)
@@ -0,0 +1,241 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+# ==============================================
+#                START OF SEQLOCK
+# ==============================================
+
+class Seqlock:
+    """
+    One record in a shared buffer, guarded by a sequence word.
+
+    The writer makes the sequence odd, packs the record and makes it even
+    again; a reader retries until it sees the same even sequence before and
+    after unpacking. Neither side takes a lock, so a reader in another
+    process can never stall the writer. There must be exactly one writer per
+    record. The sequence is a native 32 bit word stored in one aligned write,
+    which doesn't tear on the Pi's 32 bit ARM.
+    """
+
+    def __init__(self, buf, offset, layout):
+        self.sequence = buf[offset:offset + 4].cast("I")
+        self.layout = layout
+        self.buf = buf
+        self.offset = offset + 8
+        self.retries = 0
+
+    @staticmethod
+    def size(layout):
+        return 8 + (layout.size + 7) // 8 * 8
+
+    def write(self, values):
+        sequence = self.sequence[0]
+        self.sequence[0] = (sequence + 1) & 0xFFFFFFFF
+        self.layout.pack_into(self.buf, self.offset, *values)
+        self.sequence[0] = (sequence + 2) & 0xFFFFFFFF
+
+    def read(self, timeout=0.1):
+        deadline = None
+        while True:
+            before = self.sequence[0]
+            if not before & 1:
+                values = self.layout.unpack_from(self.buf, self.offset)
+                if self.sequence[0] == before:
+                    return values
+            self.retries += 1
+            # The writer was preempted mid-write; give it the CPU
+            if deadline is None:
+                deadline = time.monotonic() + timeout
+            elif time.monotonic() > deadline:
+                raise TimeoutError("shared state writer never finished a write")
+            time.sleep(0)
+
+    def release(self):
+        self.sequence.release()
+
+# ==============================================
+#              START OF SHARED STATE
+# ==============================================
+
+# Machine state owned by the UI process
+LineState = namedtuple("LineState", [
+    "running",      # conveyor output is on
+    "start_time",   # wall clock time the run timer counts from, 0 when reset
+    "elapsed",      # run time in seconds, as shown on screen
+    "total",        # blocks since the last total reset
+    "colors",       # per color counts, in block_colors order
+])
+
+# Motor state owned by whoever runs the StepperEngine
+MotorState = namedtuple("MotorState", [
+    "position",
+    "state",        # index into MOTOR_STATES
+    "direction",    # 1 or -1
+    "jog_finished", # id of the last jog that ended, completed or not
+    "jog_completed",# id of the last jog that ran to the end
+    "remaining",    # steps left in the current jog
+    "delay",        # seconds between steps at the set speed
+    "late_avg_ms",
+    "late_max_ms",
+    "error",        # last fault, "" if none
+])
+
+MOTOR_STATES = ("idle", "jogging", "running", "fault")
+
+MAGIC = b"CONVSHM2"
+HEADER = struct.Struct("<8sI4x")
+ERROR_BYTES = 64  # Longer fault messages are cut short
+MOTOR_LAYOUT = struct.Struct("<qBb6xqqqddd{}s".format(ERROR_BYTES))
+
+def _line_layout(color_count):
+    return struct.Struct("<?7xddQ" + "Q" * color_count)
+
+def _map_existing(name):
+    """
+    Before 3.13, SharedMemory(name) registers the block with this process's
+    resource tracker, which unlinks it when this process exits and takes it
+    away from the controller. Map it straight from /dev/shm there instead.
+    """
+    if sys.version_info >= (3, 13):
+        shm = shared_memory.SharedMemory(name=name, track=False)
+        return shm, shm.buf
+    fd = os.open(os.path.join("/dev/shm", name.lstrip("/")), os.O_RDWR)
+    try:
+        mem = mmap.mmap(fd, 0)
+    finally:
+        os.close(fd)
+    return mem, memoryview(mem)
+
+class SharedState:
+    """
+    Fixed-layout machine status in shared memory: a header with the color
+    count, then the line record and the motor record, each its own Seqlock
+    so the UI and the motion process can write side by side.
+
+    Writers call update_line / update_motor, which keep the last written
+    values in `line` / `motor` and skip the write when nothing changed.
+    Other processes attach by name and call read_line / read_motor.
+    """
+
+    def __init__(self, name, handle, buf, color_count, owner):
+        self.name = name
+        self.handle = handle
+        self.buf = buf
+        self.owner = owner
+
+        line_layout = _line_layout(color_count)
+        line_offset = HEADER.size
+        motor_offset = line_offset + Seqlock.size(line_layout)
+        self.line_lock = Seqlock(self.buf, line_offset, line_layout)
+        self.motor_lock = Seqlock(self.buf, motor_offset, MOTOR_LAYOUT)
+
+        self.line = LineState(False, 0.0, 0.0, 0, (0,) * color_count)
+        self.motor = MotorState(0, 0, 1, 0, 0, 0, 0.0, 0.0, 0.0, "")
+
+    @staticmethod
+    def _size(color_count):
+        return HEADER.size + Seqlock.size(_line_layout(color_count)) + Seqlock.size(MOTOR_LAYOUT)
+
+    @classmethod
+    def create(cls, color_count, name=None):
+        shm = shared_memory.SharedMemory(name=name, create=True, size=cls._size(color_count))
+        HEADER.pack_into(shm.buf, 0, MAGIC, color_count)
+        state = cls(shm.name, shm, shm.buf, color_count, owner=True)
+        state.line_lock.write(state._pack_line(state.line))
+        state.motor_lock.write(state._pack_motor(state.motor))
+        return state
+
+    @classmethod
+    def attach(cls, name):
+        handle, buf = _map_existing(name)
+        magic, color_count = HEADER.unpack_from(buf, 0)
+        if magic != MAGIC:
+            buf.release()
+            handle.close()
+            raise ValueError(name + " is not a conveyor state block")
+        state = cls(name, handle, buf, color_count, owner=False)
+        state.line = state.read_line()
+        state.motor = state.read_motor()
+        return state
+
+    # ---------- Line record ----------
+
+    @staticmethod
+    def _pack_line(line):
+        return (line.running, line.start_time, line.elapsed, line.total) + tuple(line.colors)
+
+    def update_line(self, **fields):
+        if "colors" in fields:
+            fields["colors"] = tuple(fields["colors"])
+        line = self.line._replace(**fields)
+        if line != self.line:
+            self.line = line
+            self.line_lock.write(self._pack_line(line))
+
+    def read_line(self):
+        values = self.line_lock.read()
+        return LineState(values[0], values[1], values[2], values[3], values[4:])
+
+    # ---------- Motor record ----------
+
+    @staticmethod
+    def _pack_motor(motor):
+        return motor[:-1] + (motor.error.encode("utf-8", "replace")[:ERROR_BYTES],)
+
+    def update_motor(self, **fields):
+        motor = self.motor._replace(**fields)
+        if motor != self.motor:
+            self.motor = motor
+            self.motor_lock.write(self._pack_motor(motor))
+
+    def publish_stepper(self, status):
+        """Copies a StepperEngine.status() dict into the motor record."""
+        self.update_motor(position=status["position"], state=MOTOR_STATES.index(status["state"]),
+                          direction=status["direction"], remaining=status["remaining"], delay=status["delay"],
+                          late_avg_ms=status["late_avg_ms"], late_max_ms=status["late_max_ms"],
+                          error=status["error"] or "")
+
+    def read_motor(self):
+        values = self.motor_lock.read()
+        return MotorState(*values[:-1], values[-1].rstrip(b"\0").decode("utf-8", "replace"))
+
+    def close(self):
+        """Detaches; the creator also removes the block."""
+        self.line_lock.release()
+        self.motor_lock.release()
+        if not isinstance(self.handle, shared_memory.SharedMemory):
+            self.buf.release()
+        self.buf = None
+        self.handle.close()
+        if self.owner:
+            self.handle.unlink()
+
+# ==============================================
+#                 START OF MONITOR
+# ==============================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print the state of a running controller from its shared memory block.")
+    parser.add_argument("name", help="shared memory name, printed by the controller at startup")
+    parser.add_argument("--interval", type=float, default=1.0)
+    args = parser.parse_args()
+
+    state = SharedState.attach(args.name)
+    try:
+        while True:
+            line = state.read_line()
+            motor = state.read_motor()
+            print("{} elapsed {:.2f}s total {} colors {} | motor {} at {}".format(
+                "RUNNING" if line.running else "stopped", line.elapsed, line.total, list(line.colors),
+                MOTOR_STATES[motor.state], motor.position))
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        state.close()
@@ -0,0 +1,352 @@
+import argparse
+import heapq
+import os
+import random
+import tempfile
+import time
+import zlib
+
+from . import app
+from . import production_log as plog
+from .control_core import run_sync
+from .hardware import QuietGPIOMock
+from .shared_state import SharedState
+from .stepper import MotionHandle
+
+# ==============================================
+#              START OF VIRTUAL CLOCK
+# ==============================================
+
+class VirtualClock:
+    """
+    Stands in for the time module: monotonic() and time() only move when the
+    simulation advances them. Wall time starts at a fixed epoch so logs come
+    out identical run to run.
+    """
+
+    def __init__(self, epoch=1700000000.0):
+        self.now = 0.0
+        self.epoch = epoch
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.epoch + self.now
+
+# ==============================================
+#          START OF VIRTUAL MOTOR AND SENSOR
+# ==============================================
+
+class VirtualStepper:
+    """
+    Same interface as StepperEngine, but steps are taken by advance() on the
+    virtual clock instead of by a thread, following the same delay tables.
+    """
+
+    def __init__(self, clock, sequence, delay=0.01):
+        self.clock = clock
+        self.sequence = sequence
+        self.delay = delay
+        self.state = "idle"
+        self.direction = 1
+        self.position = 0
+        self.deadline = 0.0
+        self.current = None
+        self.on_done = None
+        self.delays = None
+        self.steps_taken = 0
+
+    def jog(self, steps, on_done=None, delays=None):
+        if delays is not None and len(delays) != abs(steps):
+            raise ValueError("Delay table has " + str(len(delays)) + " entries for " + str(abs(steps)) + " steps")
+        self._cancel_current()
+        handle = MotionHandle(steps)
+        if steps == 0:
+            handle._finish()
+            return handle
+        self.current = handle
+        self.on_done = on_done
+        self.delays = delays
+        self.direction = 1 if steps > 0 else -1
+        self._begin("jogging")
+        return handle
+
+    def run(self, direction=1):
+        self._cancel_current()
+        self.delays = None
+        self.direction = 1 if direction >= 0 else -1
+        self._begin("running")
+
+    def stop(self):
+        self._cancel_current()
+        self.state = "idle"
+
+    def set_speed(self, delay):
+        self.delay = delay
+
+    def reset_timing(self):
+        pass
+
+    def shutdown(self, timeout=None):
+        self.stop()
+
+    @property
+    def busy(self):
+        return self.state in ("jogging", "running")
+
+    def status(self):
+        current = self.current
+        return {
+            "state": self.state,
+            "position": self.position,
+            "direction": self.direction,
+            "delay": self.delay,
+            "remaining": current.steps - current.steps_done if current else 0,
+            "late_avg_ms": 0.0,
+            "late_max_ms": 0.0,
+            "error": None,
+        }
+
+    def _begin(self, state):
+        if not self.busy:
+            self.deadline = self.clock.now
+        self.state = state
+
+    def _cancel_current(self):
+        if self.current is not None:
+            self.current._finish(cancelled=True)
+            self.current = None
+
+    def advance(self, now):
+        """Takes every step due by `now`."""
+        while self.busy and self.deadline <= now:
+            self.position += self.direction
+            self.steps_taken += 1
+            current = self.current
+            if self.delays is not None and current is not None:
+                self.deadline += self.delays[current.steps_done]
+            else:
+                self.deadline += self.delay
+            if current is not None:
+                current.steps_done += 1
+                if current.steps_done >= current.steps:
+                    self.current = None
+                    self.state = "idle"
+                    current._finish()
+                    if self.on_done is not None:
+                        self.on_done()
+
+class SimulatedSensor:
+    """
+    Sensor interface for the simulation: fills the pallets from the seeded
+    rng and, while running, schedules block arrivals (exponential gaps at
+    `rate_per_min`) that the simulation feeds through app.observe_blocks.
+    """
+
+    def __init__(self, simulation, rng, rate_per_min):
+        self.simulation = simulation
+        self.rng = rng
+        self.rate_per_min = rate_per_min
+        self.pallet = None
+        self.running = False
+        self.pending = False
+        self.position = 0
+
+    def fill_pallets(self, pallet):
+        self.pallet = pallet
+        pallet.fill(self.rng.choice(pallet.colors) for _ in range(pallet.layers * pallet.slots))
+
+    def attach(self, counter):
+        pass
+
+    def set_running(self, running):
+        self.running = running
+        # An arrival still pending from before a stop carries on the stream
+        if running and not self.pending:
+            self.schedule_next()
+
+    def close(self):
+        self.running = False
+
+    def schedule_next(self):
+        self.pending = True
+        self.simulation.schedule(self.rng.expovariate(self.rate_per_min / 60.0), "block")
+
+    def next_block(self):
+        pallet = self.pallet
+        code = pallet.cells[self.position % len(pallet)]
+        self.position += 1
+        return pallet.colors[code]
+
+# ==============================================
+#               START OF SIMULATION
+# ==============================================
+
+class ShiftSimulation:
+    """
+    Runs a whole shift through the application's own start/stop/jog and
+    observe_blocks logic on a virtual clock, without a window or real time.
+
+    The operator starts the line, it runs for exponentially distributed
+    stretches (mean `mean_run` seconds) until a stop, may be jogged a few
+    times, and is restarted after `mean_stop` seconds on average. Every
+    random choice comes from one random.Random(seed), so a seed always
+    replays the same shift.
+    """
+
+    def __init__(self, hours=8.0, seed=1, block_rate=40.0, mean_run=1200.0, mean_stop=180.0,
+                 jog_chance=0.5, frame_interval=1.0, log_path=None):
+        self.duration = hours * 3600.0
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.mean_run = mean_run
+        self.mean_stop = mean_stop
+        self.jog_chance = jog_chance
+        self.frame_interval = frame_interval
+        self.log_path = log_path
+
+        self.clock = VirtualClock()
+        self.stepper = VirtualStepper(self.clock, app.step_sequence)
+        self.sensor = SimulatedSensor(self, self.rng, block_rate)
+        # Doubles as the backend handed to app.setup_hardware
+        self.gpio = QuietGPIOMock()
+        self.caption = "Conveyor Simulation"
+
+        self.events = []
+        self.sequence = 0
+        self.handled = {}
+
+    # ---------- Event queue ----------
+
+    def schedule(self, delay, kind):
+        self.sequence += 1
+        heapq.heappush(self.events, (self.clock.now + delay, self.sequence, kind))
+
+    def run(self):
+        log_dir = None
+        log_path = self.log_path
+        if log_path is None:
+            log_dir = tempfile.mkdtemp(prefix="conveyor-sim-")
+            log_path = os.path.join(log_dir, "production.bin")
+
+        shared = SharedState.create(len(app.block_colors))
+        app.setup_hardware(self, shared, processes=self, clock=self.clock, log_path=log_path)
+        started = time.perf_counter()
+        try:
+            app.step_motor(steps=100, delay=0.01)
+            self.schedule(5.0, "start")
+            self.schedule(self.frame_interval, "frame")
+            self.schedule(self.duration, "end")
+
+            while self.events:
+                when, _, kind = heapq.heappop(self.events)
+                self.stepper.advance(when)
+                self.clock.now = when
+                self.handled[kind] = self.handled.get(kind, 0) + 1
+                if kind == "end":
+                    break
+                getattr(self, "_on_" + kind)()
+
+            run_sync(app.stop)
+            app.refresh_state()
+            wall = time.perf_counter() - started
+            summary = self.summarize(wall)
+        finally:
+            self.sensor.close()
+            app.production_log.close()
+            shared.close()
+
+        totals = plog.replay(log_path, len(app.block_colors))
+        summary["log_matches"] = totals is not None and totals.total == summary["total"] and list(totals.colors) == summary["colors"]
+        if log_dir is not None:
+            os.remove(log_path)
+            os.rmdir(log_dir)
+        return summary
+
+    # ---------- Events ----------
+
+    def _on_start(self):
+        run_sync(app.start)
+        self.schedule(self.rng.expovariate(1.0 / self.mean_run), "stop")
+
+    def _on_stop(self):
+        run_sync(app.stop)
+        restart = self.rng.expovariate(1.0 / self.mean_stop)
+        if self.rng.random() < self.jog_chance:
+            # A few jogs, 10 s apart, while it is down
+            for i in range(self.rng.randint(1, 3)):
+                if 10.0 * (i + 1) < restart:
+                    self.schedule(10.0 * (i + 1), "jog")
+        self.schedule(restart, "start")
+
+    def _on_jog(self):
+        if not app.state.line.running:
+            run_sync(app.jog_conveyor)
+
+    def _on_block(self):
+        self.sensor.pending = False
+        if not app.state.line.running:
+            return
+        app.observe_blocks(self.sensor.next_block(), self.clock.monotonic())
+        self.sensor.schedule_next()
+
+    def _on_frame(self):
+        app.refresh_state()
+        app.state.publish_stepper(self.stepper.status())
+        self.schedule(self.frame_interval, "frame")
+
+    # ---------- Results ----------
+
+    def summarize(self, wall):
+        line = app.metrics.snapshot()
+        counts = app.state.line
+        hours = self.duration / 3600.0
+        summary = {
+            "seed": self.seed,
+            "virtual_hours": hours,
+            "wall_seconds": wall,
+            "speedup": self.duration / wall if wall > 0 else float("inf"),
+            "events": dict(sorted(self.handled.items())),
+            "total": counts.total,
+            "colors": list(counts.colors),
+            "blocks_per_hour": counts.total / hours,
+            "blocks_per_run_hour": counts.total / (line.run_seconds / 3600.0) if line.run_seconds else 0.0,
+            "run_seconds": line.run_seconds,
+            "idle_seconds": line.idle_seconds,
+            "utilization": line.run_seconds / self.duration,
+            "cycle_time": line.cycle_time,
+            "motor_steps": self.stepper.steps_taken,
+            "motor_position": self.stepper.position,
+        }
+        summary["fingerprint"] = "{:08x}".format(zlib.crc32(repr((summary["total"], summary["colors"], round(summary["run_seconds"], 6), summary["motor_steps"])).encode()))
+        return summary
+
+def format_summary(summary):
+    lines = [
+        "Simulated {virtual_hours:.1f} h (seed {seed}) in {wall_seconds:.2f} s wall, {speedup:,.0f}x real time".format(**summary),
+        "Events: " + ", ".join("{} {}".format(kind, count) for kind, count in summary["events"].items()),
+        "Blocks: {} total ({}), {:.1f}/h over the shift, {:.1f}/h while running".format(
+            summary["total"], ", ".join("{} {}".format(color, count) for color, count in zip(app.block_colors, summary["colors"])),
+            summary["blocks_per_hour"], summary["blocks_per_run_hour"]),
+        "Run {:.0f} s, idle {:.0f} s, utilization {:.1%}, cycle time {}".format(
+            summary["run_seconds"], summary["idle_seconds"], summary["utilization"],
+            "-" if summary["cycle_time"] is None else "{:.2f} s".format(summary["cycle_time"])),
+        "Motor: {motor_steps} steps, position {motor_position}".format(**summary),
+        "Production log replay {}; fingerprint {}".format("matches" if summary["log_matches"] else "DOES NOT MATCH", summary["fingerprint"]),
+    ]
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a headless, deterministic shift through the controller logic.")
+    parser.add_argument("--hours", type=float, default=8.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--rate", type=float, default=40.0, help="block arrivals per minute while running")
+    parser.add_argument("--mean-run", type=float, default=1200.0, help="mean seconds between stops")
+    parser.add_argument("--mean-stop", type=float, default=180.0, help="mean seconds stopped")
+    parser.add_argument("--log", default=None, help="keep the production log here instead of a temporary file")
+    args = parser.parse_args()
+
+    simulation = ShiftSimulation(hours=args.hours, seed=args.seed, block_rate=args.rate,
+                                 mean_run=args.mean_run, mean_stop=args.mean_stop, log_path=args.log)
+    print(format_summary(simulation.run()))
@@ -0,0 +1,231 @@
+import queue
+import threading
+import time
+
+# ==============================================
+#             START OF STEPPER ENGINE
+# ==============================================
+
+class MotionHandle:
+    """Returned by StepperEngine.jog so the UI can follow a move without blocking on it."""
+
+    def __init__(self, steps):
+        self.steps = abs(steps)
+        self.steps_done = 0
+        self.cancelled = False
+        self._done = threading.Event()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def _finish(self, cancelled=False):
+        self.cancelled = cancelled
+        self._done.set()
+
+class StepperEngine:
+    """
+    Drives a stepper from its own thread so the UI never sleeps between phases.
+
+    Commands (jog, run, stop, set_speed) go through a queue and are picked up
+    between steps; the thread waits on that queue instead of sleeping, so a
+    stop takes effect before the next phase change. Step times are scheduled
+    against absolute deadlines so the rate does not drift with write time.
+
+    write_phase is called on the stepper thread with one entry of `sequence`
+    per motor step.
+    """
+
+    def __init__(self, write_phase, sequence, delay=0.01):
+        self.write_phase = write_phase
+        self.sequence = sequence
+        self.delay = delay
+
+        self.commands = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="stepper", daemon=True)
+
+        # Owned by the stepper thread, read by anyone through status()
+        self.state = "idle"
+        self.direction = 1
+        self.position = 0
+        self.phase_index = len(sequence) - 1
+        self.deadline = 0.0
+        self.current = None
+        self.on_done = None
+        self.delays = None
+        self.error = None
+
+        # Step timing error, seconds late against the planned deadline
+        self.steps_taken = 0
+        self.late_total = 0.0
+        self.late_max = 0.0
+        # Optional instrumentation Probe that gets every step's lateness
+        self.late_samples = None
+
+    # ---------- UI side ----------
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def jog(self, steps, on_done=None, delays=None):
+        """
+        Moves `steps` motor steps (negative to reverse). Replaces any move in progress.
+        delays, if given, is a per-step table (see motion_planner) used instead of the set speed.
+        """
+        if delays is not None and len(delays) != abs(steps):
+            raise ValueError("Delay table has " + str(len(delays)) + " entries for " + str(abs(steps)) + " steps")
+        handle = MotionHandle(steps)
+        self.commands.put(("jog", (steps, handle, on_done, delays)))
+        return handle
+
+    def run(self, direction=1):
+        """Steps continuously until stop() or another command."""
+        self.commands.put(("run", 1 if direction >= 0 else -1))
+
+    def stop(self):
+        self.commands.put(("stop", None))
+
+    def set_speed(self, delay):
+        """Sets the delay between motor steps in seconds."""
+        self.commands.put(("speed", delay))
+
+    def reset_timing(self):
+        """Zeroes the step timing stats, in order with the other commands, so they cover only what comes next."""
+        self.commands.put(("reset_timing", None))
+
+    def shutdown(self, timeout=1.0):
+        if self.thread.is_alive():
+            self.commands.put(("shutdown", None))
+            self.thread.join(timeout)
+
+    @property
+    def busy(self):
+        return self.state in ("jogging", "running")
+
+    def status(self):
+        current = self.current
+        return {
+            "state": self.state,
+            "position": self.position,
+            "direction": self.direction,
+            "delay": self.delay,
+            "remaining": current.steps - current.steps_done if current else 0,
+            "late_avg_ms": 1000 * self.late_total / self.steps_taken if self.steps_taken else 0.0,
+            "late_max_ms": 1000 * self.late_max,
+            "error": self.error,
+        }
+
+    # ---------- Stepper thread ----------
+
+    def _run(self):
+        while True:
+            if not self.busy:
+                if not self._handle(self.commands.get()):
+                    return
+                continue
+
+            wait = self.deadline - time.perf_counter()
+            if wait > 0:
+                try:
+                    command = self.commands.get(timeout=wait)
+                except queue.Empty:
+                    pass
+                else:
+                    if not self._handle(command):
+                        return
+                    continue
+
+            try:
+                self._step()
+            except Exception as e:
+                self.error = repr(e)
+                self.state = "fault"
+                self._cancel_current()
+
+    def _handle(self, command):
+        kind, arg = command
+
+        if kind == "jog":
+            steps, handle, on_done, delays = arg
+            self._cancel_current()
+            if steps == 0:
+                handle._finish()
+                return True
+            self.current = handle
+            self.on_done = on_done
+            self.delays = delays
+            self.direction = 1 if steps > 0 else -1
+            self._begin_motion("jogging")
+
+        elif kind == "run":
+            self._cancel_current()
+            self.delays = None
+            self.direction = arg
+            self._begin_motion("running")
+
+        elif kind == "stop":
+            self._cancel_current()
+            self.state = "idle"
+
+        elif kind == "speed":
+            self.delay = arg
+
+        elif kind == "reset_timing":
+            self.steps_taken = 0
+            self.late_total = 0.0
+            self.late_max = 0.0
+
+        elif kind == "shutdown":
+            self._cancel_current()
+            self.state = "idle"
+            return False
+
+        return True
+
+    def _begin_motion(self, state):
+        if not self.busy:
+            self.deadline = time.perf_counter()
+        self.state = state
+        self.error = None
+
+    def _cancel_current(self):
+        if self.current is not None:
+            self.current._finish(cancelled=True)
+            self.current = None
+
+    def _step(self):
+        now = time.perf_counter()
+        late = now - self.deadline
+        self.steps_taken += 1
+        self.late_total += late
+        if late > self.late_max:
+            self.late_max = late
+        if self.late_samples is not None:
+            self.late_samples.add(late, now)
+
+        self.phase_index = (self.phase_index + self.direction) % len(self.sequence)
+        self.write_phase(self.sequence[self.phase_index])
+        self.position += self.direction
+
+        current = self.current
+        if self.delays is not None and current is not None:
+            delay = self.delays[current.steps_done]
+        else:
+            delay = self.delay
+        self.deadline += delay
+        if self.deadline < now:
+            # Lost more than a whole step (e.g. descheduled); don't burst to catch up
+            self.deadline = now + delay
+
+        if current is not None:
+            current.steps_done += 1
+            if current.steps_done >= current.steps:
+                self.current = None
+                self.state = "idle"
+                current._finish()
+                if self.on_done is not None:
+                    self.on_done()
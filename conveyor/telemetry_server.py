@@ -0,0 +1,229 @@
+import argparse
+import asyncio
+import json
+import socket
+import threading
+import time
+
+from .shared_state import MOTOR_STATES
+
+# ==============================================
+#             START OF TELEMETRY SERVER
+# ==============================================
+
+# Requests are one word per line; every reply and update is one JSON object per line.
+#   get       current snapshot
+#   watch     push snapshots at the server's rate until unwatch
+#   unwatch
+#   start, stop, jog (whatever commands the server was given)
+#   help
+#   quit
+HELP = ("get", "watch", "unwatch", "help", "quit")
+
+# A watcher whose socket has this much unsent data is skipped until it catches up
+MAX_BACKLOG = 64 * 1024
+
+class TelemetryServer:
+    """
+    TCP line-protocol server for a supervisory PC: counts, run time and the
+    motor from `state` (a SharedState), blocks per color on `pallet` (a
+    Pallet, optional), and the commands in `commands` (name -> callable
+    returning True if the controller took it).
+
+    Runs its own event loop on its own thread, so clients never cost the UI
+    a frame. Snapshots are read through the seqlocks and pushed to every
+    watcher once per 1/rate seconds, encoded once per tick. At most
+    `max_clients` are connected at a time; a slow client misses updates
+    rather than holding up the others. Listens on localhost unless told
+    otherwise; there is no authentication.
+    """
+
+    def __init__(self, state, colors, commands=None, host="127.0.0.1", port=8765, rate=4.0, max_clients=8, pallet=None):
+        self.state = state
+        self.pallet = pallet
+        self.colors = [str(color) for color in colors]
+        self.commands = dict(commands or {})
+        self.host = host
+        self.port = port
+        self.rate = rate
+        self.max_clients = max_clients
+
+        self.clients = set()
+        self.watchers = set()
+        self.loop = None
+        self.thread = None
+        self.ready = threading.Event()
+        self.error = None
+
+        self.accepted = 0
+        self.rejected = 0
+        self.pushed = 0
+        self.dropped = 0
+
+    def snapshot(self):
+        line = self.state.read_line()
+        motor = self.state.read_motor()
+        elapsed = time.time() - line.start_time if line.running else line.elapsed
+        snapshot = {
+            "time": round(time.time(), 3),
+            "running": line.running,
+            "count": line.total,
+            "colors": dict(zip(self.colors, line.colors)),
+            "elapsed": round(elapsed, 2),
+            "motor": {"state": MOTOR_STATES[motor.state], "position": motor.position},
+        }
+        if self.pallet is not None:
+            # One bincount over the pallet's bytes, however many layers and slots
+            snapshot["pallet"] = {"blocks": len(self.pallet), "colors": dict(zip(self.colors, self.pallet.histogram()))}
+        return snapshot
+
+    # ---------- Lifecycle ----------
+
+    def start(self, timeout=5.0):
+        """Starts serving on a daemon thread; raises OSError if the port can't be bound."""
+        self.thread = threading.Thread(target=self._serve, name="telemetry", daemon=True)
+        self.thread.start()
+        self.ready.wait(timeout)
+        if self.error is not None:
+            raise self.error
+        return self
+
+    def close(self, timeout=2.0):
+        loop = self.loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._stopped.set)
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def summary(self):
+        return "{} clients served, {} turned away, {} updates pushed, {} dropped".format(
+            self.accepted, self.rejected, self.pushed, self.dropped)
+
+    def _serve(self):
+        try:
+            asyncio.run(self._main())
+        except OSError as e:
+            self.error = e
+            self.ready.set()
+
+    async def _main(self):
+        self._stopped = asyncio.Event()
+        server = await asyncio.start_server(self._client, self.host, self.port, limit=1024)
+        self.port = server.sockets[0].getsockname()[1]
+        self.loop = asyncio.get_running_loop()
+        self.ready.set()
+
+        pusher = asyncio.create_task(self._push())
+        try:
+            await self._stopped.wait()
+        finally:
+            self.loop = None
+            pusher.cancel()
+            server.close()
+            for writer in list(self.clients):
+                writer.close()
+            await server.wait_closed()
+
+    # ---------- Clients ----------
+
+    async def _client(self, reader, writer):
+        if len(self.clients) >= self.max_clients:
+            self.rejected += 1
+            writer.write(_encode({"error": "too many clients"}))
+            writer.close()
+            return
+        self.accepted += 1
+        self.clients.add(writer)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    break
+                if not line:
+                    break
+                request = line.decode("ascii", "replace").strip().lower()
+                if request == "quit":
+                    break
+                if request:
+                    writer.write(_encode(self._handle(request, writer)))
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.discard(writer)
+            self.watchers.discard(writer)
+            writer.close()
+
+    def _handle(self, request, writer):
+        if request == "get":
+            return self.snapshot()
+        if request == "watch":
+            self.watchers.add(writer)
+            return {"ok": "watch", "rate": self.rate}
+        if request == "unwatch":
+            self.watchers.discard(writer)
+            return {"ok": "unwatch"}
+        if request == "help":
+            return {"commands": list(HELP) + sorted(self.commands)}
+        command = self.commands.get(request)
+        if command is None:
+            return {"error": "unknown command: " + request}
+        if not command():
+            return {"error": "controller not running"}
+        return {"ok": request}
+
+    async def _push(self):
+        loop = asyncio.get_running_loop()
+        period = 1.0 / self.rate
+        deadline = loop.time()
+        while True:
+            if self.watchers:
+                data = _encode(self.snapshot())
+                for writer in list(self.watchers):
+                    if writer.transport.get_write_buffer_size() > MAX_BACKLOG:
+                        self.dropped += 1
+                        continue
+                    writer.write(data)
+                    self.pushed += 1
+            deadline += period
+            now = loop.time()
+            if deadline < now:
+                deadline = now
+            await asyncio.sleep(deadline - now)
+
+def _encode(message):
+    return (json.dumps(message, separators=(",", ":")) + "\n").encode()
+
+# ==============================================
+#                 START OF CLIENT
+# ==============================================
+
+def request(host, port, command, count=None, timeout=5.0):
+    """
+    Sends one request and yields the decoded replies: one for most commands,
+    then a stream of updates for watch (`count` of them, or until closed).
+    """
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        sock.sendall((command + "\n").encode())
+        stream = sock.makefile("rb")
+        received = 0
+        for line in stream:
+            yield json.loads(line)
+            received += 1
+            if command != "watch" or (count is not None and received > count):
+                break
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Talk to a running controller's telemetry server.")
+    parser.add_argument("command", nargs="?", default="get", help="get, watch, start, stop, jog or help (default: get)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--count", type=int, default=None, help="watch: stop after this many updates")
+    args = parser.parse_args()
+
+    try:
+        for reply in request(args.host, args.port, args.command, args.count, timeout=None if args.command == "watch" else 5.0):
+            print(json.dumps(reply))
+    except KeyboardInterrupt:
+        pass
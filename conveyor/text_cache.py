@@ -0,0 +1,74 @@
+from collections import OrderedDict
+
+# ==============================================
+#              START OF TEXT CACHE
+# ==============================================
+
+class TextCache:
+    """
+    LRU cache of rendered text surfaces keyed by (font, text, color, antialias).
+
+    Cached surfaces are shared between callers, so they must only ever be
+    blitted, never drawn on. The cache is bounded both by entry count and by
+    the pixel memory the surfaces hold.
+    """
+
+    def __init__(self, max_entries=512, max_bytes=2 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes_used = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def render(self, font, text, color, antialias=True):
+        key = (font, text, tuple(color), antialias)
+        surface = self.entries.get(key)
+        if surface is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        size = surface.get_pitch() * surface.get_height()
+        if size > self.max_bytes:
+            # Never worth evicting the whole cache for one huge string
+            return surface
+
+        self.entries[key] = surface
+        self.bytes_used += size
+        while len(self.entries) > self.max_entries or self.bytes_used > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.bytes_used -= evicted.get_pitch() * evicted.get_height()
+            self.evictions += 1
+        return surface
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes_used = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self.entries),
+            "bytes": self.bytes_used,
+        }
+
+    def summary(self):
+        stats = self.stats()
+        return "{} hits, {} misses ({:.1%} hit rate), {} entries, {:.1f} KiB".format(
+            stats["hits"], stats["misses"], stats["hit_rate"], stats["entries"], stats["bytes"] / 1024
+        )
+
+# Shared by every widget so identical labels across widgets are rendered once
+text_cache = TextCache()
+
+def render_text(font, text, color, antialias=True):
+    return text_cache.render(font, text, color, antialias)
@@ -0,0 +1,306 @@
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+import pygame
+
+# ==============================================
+#              START OF FRAME SOURCES
+# ==============================================
+
+class V4L2Source:
+    """Live frames from a V4L2 camera through pygame.camera."""
+
+    def __init__(self, device="/dev/video0", size=(320, 240)):
+        import pygame.camera
+        pygame.camera.init()
+        self.camera = pygame.camera.Camera(device, size, "RGB")
+        self.camera.start()
+
+    def read(self):
+        """Blocks until the next frame and returns it as a Surface."""
+        return self.camera.get_image()
+
+    def close(self):
+        self.camera.stop()
+
+class DirectorySource:
+    """
+    Replays recorded images (sorted by name) at `fps`, so the whole pipeline
+    can be run and tuned offline. Loops forever unless loop=False.
+    """
+
+    EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+    def __init__(self, path, fps=30, loop=True):
+        self.files = sorted(os.path.join(path, name) for name in os.listdir(path) if name.lower().endswith(self.EXTENSIONS))
+        if not self.files:
+            raise ValueError("No images found in " + path)
+        self.period = 1.0 / fps
+        self.loop = loop
+        self.position = 0
+        self.next_frame = time.perf_counter()
+
+    def read(self):
+        if self.position >= len(self.files):
+            if not self.loop:
+                return None
+            self.position = 0
+        delay = self.next_frame - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        self.next_frame = max(self.next_frame + self.period, time.perf_counter())
+        surface = pygame.image.load(self.files[self.position])
+        self.position += 1
+        return surface
+
+    def close(self):
+        pass
+
+def open_source(spec, size=(320, 240), fps=30):
+    """A directory replays recorded images, anything else is a V4L2 device path."""
+    if os.path.isdir(spec):
+        return DirectorySource(spec, fps)
+    return V4L2Source(spec, size)
+
+# ==============================================
+#            START OF COLOR CLASSIFIER
+# ==============================================
+
+# Hue ranges in degrees for each block color. Red wraps around 0.
+DEFAULT_HUE_RANGES = {
+    "Red": ((0, 15), (345, 360)),
+    "Yellow": ((40, 70),),
+    "Green": ((80, 165),),
+    "Blue": ((190, 260),),
+}
+
+def rgb_to_hsv(pixels):
+    """uint8 (..., 3) RGB -> hue in degrees [0, 360), saturation and value in [0, 1]."""
+    rgb = pixels.astype(np.float32) / 255.0
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    value = rgb.max(axis=-1)
+    chroma = value - rgb.min(axis=-1)
+    saturation = np.where(value > 0, chroma / np.maximum(value, 1e-6), 0.0)
+
+    safe = np.maximum(chroma, 1e-6)
+    hue = np.where(value == r, ((g - b) / safe) % 6.0,
+          np.where(value == g, (b - r) / safe + 2.0, (r - g) / safe + 4.0))
+    hue = np.where(chroma > 0, hue * 60.0, 0.0)
+    return hue, saturation, value
+
+class HSVClassifier:
+    """
+    Labels pixels by HSV thresholds. Codes are 0 for background (belt,
+    shadows, anything too grey or dark) and i + 1 for colors[i].
+    """
+
+    def __init__(self, colors, hue_ranges=DEFAULT_HUE_RANGES, min_saturation=0.45, min_value=0.25):
+        self.colors = list(colors)
+        self.hue_ranges = hue_ranges
+        self.min_saturation = min_saturation
+        self.min_value = min_value
+
+    def classify(self, pixels):
+        hue, saturation, value = rgb_to_hsv(pixels)
+        codes = np.zeros(hue.shape, dtype=np.uint8)
+        vivid = (saturation >= self.min_saturation) & (value >= self.min_value)
+        for i, color in enumerate(self.colors):
+            for low, high in self.hue_ranges.get(color, ()):
+                codes[vivid & (hue >= low) & (hue < high)] = i + 1
+        return codes
+
+# ==============================================
+#            START OF REGION TRACKING
+# ==============================================
+
+class RegionTracker:
+    """
+    Turns per-frame labels for one region of interest into block events.
+
+    A region's label is the most common code if it covers at least
+    `min_fill` of the region, else background. A block is reported once its
+    label has held for `min_frames` frames, and the region has to read
+    background for `min_frames` again before it can report the next block.
+    """
+
+    def __init__(self, rect, min_fill=0.35, min_frames=3):
+        self.rect = rect
+        self.min_fill = min_fill
+        self.min_frames = min_frames
+        self.candidate = 0
+        self.streak = 0
+        self.occupied = False
+
+    def label(self, codes):
+        counts = np.bincount(codes.ravel(), minlength=2)
+        counts[0] = 0
+        best = int(counts.argmax())
+        if counts[best] < self.min_fill * codes.size:
+            return 0
+        return best
+
+    def update(self, code):
+        """Returns the code of a newly arrived block, or 0."""
+        if code == self.candidate:
+            self.streak += 1
+        else:
+            self.candidate = code
+            self.streak = 1
+        if self.streak != self.min_frames:
+            return 0
+
+        if code == 0:
+            self.occupied = False
+            return 0
+        if self.occupied:
+            return 0
+        self.occupied = True
+        return code
+
+def resolve_rois(rois, frame_size):
+    """Fractional (x, y, w, h) regions -> pixel rects for a frame of frame_size."""
+    width, height = frame_size
+    rects = []
+    for x, y, w, h in rois:
+        rects.append((int(x * width), int(y * height), max(1, int(w * width)), max(1, int(h * height))))
+    return rects
+
+# ==============================================
+#             START OF CAMERA SENSOR
+# ==============================================
+
+# One region in the middle of the frame, as fractions of width and height
+DEFAULT_ROIS = ((0.4, 0.35, 0.2, 0.3),)
+
+class CameraSensor:
+    """
+    Block sensor backed by a camera.
+
+    A capture thread reads frames into a small bounded queue, throwing away
+    the oldest frame when the classifier falls behind, so results are always
+    about the newest frame. A classifier thread labels each region of
+    interest, reports new blocks to the BlockCounter and stacks them onto
+    the pallet, slot by slot.
+    """
+
+    def __init__(self, source, rois=DEFAULT_ROIS, classifier=None, lut_path=None, queue_size=2, min_frames=3):
+        self.source = source
+        self.rois = rois
+        self.classifier = classifier
+        self.lut_path = lut_path
+        self.min_frames = min_frames
+        self.frames = queue.Queue(maxsize=queue_size)
+
+        self.colors = None
+        self.counter = None
+        self.pallet = None
+        self.trackers = None
+
+        self.running = threading.Event()
+        self.closed = threading.Event()
+        self.threads = [
+            threading.Thread(target=self._capture, name="camera-capture", daemon=True),
+            threading.Thread(target=self._classify, name="camera-classify", daemon=True),
+        ]
+
+        self.captured = 0
+        self.dropped = 0
+        self.classified = 0
+        self.classify_seconds = 0.0
+
+    # ---------- Sensor interface ----------
+
+    def fill_pallets(self, pallet):
+        # Pallets fill up from what the camera sees rather than at startup
+        self.pallet = pallet
+        self.colors = [str(color) for color in pallet.colors]
+        if self.classifier is None and self.lut_path:
+            from .color_lut import LUTClassifier
+            self.classifier = LUTClassifier.load_or_build(self.lut_path, self.colors)
+        elif self.classifier is None:
+            self.classifier = HSVClassifier(self.colors)
+
+    def attach(self, counter):
+        self.counter = counter
+        for thread in self.threads:
+            thread.start()
+
+    def set_running(self, running):
+        if running:
+            self.running.set()
+        else:
+            self.running.clear()
+
+    def close(self):
+        self.closed.set()
+        for thread in self.threads:
+            thread.join(1.0)
+        self.source.close()
+
+    def stats(self):
+        return {
+            "captured": self.captured,
+            "dropped": self.dropped,
+            "classified": self.classified,
+            "classify_ms": 1000 * self.classify_seconds / self.classified if self.classified else 0.0,
+        }
+
+    # ---------- Threads ----------
+
+    def _capture(self):
+        while not self.closed.is_set():
+            frame = self.source.read()
+            if frame is None:
+                break
+            self.captured += 1
+            if not self.running.is_set():
+                # Keep draining the camera so we never classify stale frames on start
+                continue
+            try:
+                self.frames.put_nowait(frame)
+            except queue.Full:
+                try:
+                    self.frames.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+                self.frames.put_nowait(frame)
+
+    def _classify(self):
+        while not self.closed.is_set():
+            try:
+                frame = self.frames.get(timeout=0.25)
+            except queue.Empty:
+                continue
+            started = time.perf_counter()
+            for code in self.process_frame(frame):
+                self._report(self.pallet.colors[code - 1])
+            self.classify_seconds += time.perf_counter() - started
+            self.classified += 1
+
+    def process_frame(self, frame):
+        """Classifies the regions of one Surface and returns codes of newly arrived blocks."""
+        if self.trackers is None:
+            self.trackers = [RegionTracker(rect, min_frames=self.min_frames) for rect in resolve_rois(self.rois, frame.get_size())]
+
+        arrivals = []
+        pixels = pygame.surfarray.pixels3d(frame)
+        try:
+            for tracker in self.trackers:
+                x, y, w, h = tracker.rect
+                # surfarray is indexed [x, y]; copy just the region out of the locked surface
+                region = np.array(pixels[x:x + w, y:y + h])
+                code = tracker.update(tracker.label(self.classifier.classify(region)))
+                if code:
+                    arrivals.append(code)
+        finally:
+            del pixels
+        return arrivals
+
+    def _report(self, color):
+        self.counter.report(color)
+        # A full pallet starts over with the next block
+        self.pallet.add(color)
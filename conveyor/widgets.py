@@ -0,0 +1,319 @@
+import time
+from collections import deque
+
+import pygame
+
+from .text_cache import render_text
+
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+GRAY = (230, 230, 230)
+BLUE = (0, 0, 255)
+
+# ==============================================
+#              START OF WIDGET BASE
+# ==============================================
+
+class Widget:
+    """
+    Base for everything in drawn_assets. Remembers what it last put on screen
+    so the renderer only repaints widgets whose appearance has changed.
+    """
+
+    def __init__(self):
+        self.dirty = True
+        self.drawn_rect = None
+        self._drawn_state = None
+
+    def visual_state(self):
+        """Everything that affects how the widget looks. Compared against the last drawn frame."""
+        return None
+
+    def mark_dirty(self):
+        self.dirty = True
+
+    def needs_redraw(self):
+        return self.dirty or self.visual_state() != self._drawn_state
+
+    def render(self, surface):
+        """Draws the widget and returns the screen area it covered."""
+        rect = self.draw(surface)
+        self.drawn_rect = rect
+        self._drawn_state = self.visual_state()
+        self.dirty = False
+        return rect
+
+# ==============================================
+#               START OF CONSOLE
+# ==============================================
+
+# Console class
+class Console(Widget):
+    """
+    Text panel backed by a fixed-capacity ring buffer of lines.
+
+    Used either as a scrolling log (log/schedule_logs) or, after define_fields,
+    as a live stat panel whose named rows are updated in place. Mixing the two
+    on one console is not supported.
+    """
+
+    def __init__(self, rect, text_size, text_font="monospace", max_lines=10):
+        super().__init__()
+        self.rect = pygame.Rect(rect)
+        self.font = pygame.font.SysFont(text_font, text_size, True)
+        self.max_lines = max_lines
+        self.lines = deque(maxlen=max_lines)
+
+        # For field mode: name -> row index, the raw value last shown per row,
+        # and the rows whose text changes too often to be worth caching
+        self.field_rows = {}
+        self.field_values = {}
+        self.volatile_rows = set()
+
+        # For scheduled logging
+        self.log_schedule = []
+        self.start_time = pygame.time.get_ticks()
+        self.next_log_index = 0
+
+    def log(self, message, color=BLACK):
+        self.lines.append((str(message), color))
+        self.dirty = True
+
+    def define_fields(self, names, volatile=()):
+        """
+        names: row layout top to bottom, a field name per row or None for a blank row
+        volatile: fields whose text changes nearly every frame (a running timer);
+        they are rendered straight from the font instead of through the text cache
+        """
+        if len(names) > self.max_lines:
+            raise ValueError("Console has room for " + str(self.max_lines) + " rows, got " + str(len(names)))
+        self.lines.clear()
+        self.field_rows = {}
+        self.field_values = {}
+        for name in names:
+            if name is not None:
+                self.field_rows[name] = len(self.lines)
+            self.lines.append(("", BLACK))
+        self.volatile_rows = {self.field_rows[name] for name in volatile}
+        self.dirty = True
+
+    def set_field(self, name, value, fmt="{}", color=BLACK):
+        """
+        Updates a named row in place. The text is only rebuilt, and the console
+        only marked dirty, when the value or color differs from what is shown.
+        """
+        if self.field_values.get(name) == (value, color):
+            return False
+        self.field_values[name] = (value, color)
+        self.lines[self.field_rows[name]] = (fmt.format(value), color)
+        self.dirty = True
+        return True
+
+    def visual_state(self):
+        return tuple(self.rect)
+
+    def draw(self, surface):
+        border_radius = 0
+        drawn = pygame.draw.rect(surface, GRAY, self.rect,0,border_radius)
+        pygame.draw.rect(surface, BLACK, self.rect, 2, border_radius)
+        y = self.rect.top + 5
+        for row, (message, color) in enumerate(self.lines):
+            # message_wrapped = textwrap.fill(message,((screen_width - (screen_width/5))))
+            if row in self.volatile_rows:
+                rendered = self.font.render(message, True, color)
+            else:
+                rendered = render_text(self.font, message, color)
+            drawn.union_ip(surface.blit(rendered, (self.rect.left + 5, y)))
+            y += self.font.get_height()
+        return drawn
+
+    def schedule_logs(self, log_entries):
+        """
+        log_entries: list of tuples (delay_ms_from_start, message)
+        """
+        self.log_schedule = sorted(log_entries)
+        self.start_time = pygame.time.get_ticks()
+        self.next_log_index = 0
+
+    def update(self):
+        """
+        Should be called every frame inside the game loop to update log messages based on time.
+        """
+        now = pygame.time.get_ticks() - self.start_time
+        while self.next_log_index < len(self.log_schedule) and now >= self.log_schedule[self.next_log_index][0]:
+            _, message = self.log_schedule[self.next_log_index]
+            self.log(message)
+            self.next_log_index += 1
+
+# ==============================================
+#              START OF BUTTON SYS
+# ==============================================
+
+class Button(Widget):
+    def __init__(self, rect, text, on_click, text_font="Arial", radius=0, text_size=13, text_color=(25, 25, 25), bg_color=(200, 200, 200), click_color=(150, 150, 150)):
+        super().__init__()
+        self.rect = pygame.Rect(rect)
+        self.text = text
+        self.on_click = on_click
+        self.font = pygame.font.SysFont(text_font, text_size, True)
+
+        self.text_color = text_color
+        self.bg_color = bg_color
+        self.click_color = click_color
+        self.radius = radius
+
+        self.clicked = False
+        self.mouse_over = False
+        self.argument = None
+
+    def visual_state(self):
+        return (tuple(self.rect), self.text, self.clicked, self.text_color, self.bg_color, self.click_color)
+
+    def draw(self, surface):
+        color = self.click_color if self.clicked else self.bg_color
+        drawn = pygame.draw.rect(surface, color, self.rect)
+        pygame.draw.rect(surface, (0,0,0), self.rect, 2)
+        text_surf = render_text(self.font, self.text, self.text_color)
+        text_rect = text_surf.get_rect(center=self.rect.center)
+        drawn.union_ip(surface.blit(text_surf, text_rect))
+        return drawn
+
+    def handle_event(self, event):
+        if event.type == pygame.MOUSEMOTION:
+            self.mouse_over = self.rect.collidepoint(event.pos)
+
+        elif event.type == pygame.MOUSEBUTTONDOWN:
+            if self.mouse_over and event.button == 1:
+                self.clicked = True
+
+        elif event.type == pygame.MOUSEBUTTONUP:
+            if self.clicked and self.mouse_over and event.button == 1 and self.on_click is not None:
+                self.on_click()
+            self.clicked = False
+
+class CircleButton(Widget):
+    def __init__(self, x, y, radius, color, hover_color, outline_color, text='', text_color=(255, 255, 255)):
+        super().__init__()
+        self.x = x
+        self.y = y
+        self.radius = radius
+        self.color = color
+        self.outline_color = outline_color
+        self.hover_color = hover_color or color
+        self.bright_color = (self.color[0] + 22.5 if self.color[0] < 200 else self.color[0], self.color[1] + 22.5 if self.color[1] < 200 else self.color[1], self.color[2] + 22.5 if self.color[2] < 200 else self.color[2])
+        self.text = text
+        self.font = pygame.font.SysFont("roboto mono", 30, bold=True)
+        self.text_color = text_color
+        self.clicked = False
+
+    def visual_state(self):
+        return (self.x, self.y, self.radius, self.text, self.clicked, self.color, self.hover_color, self.outline_color, self.text_color)
+
+    def draw(self, screen):
+        drawn = pygame.draw.circle(screen, self.hover_color if not self.clicked else self.color, (self.x, self.y), self.radius)
+        drawn.union_ip(pygame.draw.circle(screen, self.outline_color if not self.clicked else self.bright_color, (self.x, self.y), self.radius, 4))
+
+        if self.text and self.font:
+            text_surf = render_text(self.font, self.text, self.text_color)
+            text_rect = text_surf.get_rect(center=(self.x, self.y))
+            drawn.union_ip(screen.blit(text_surf, text_rect))
+        return drawn
+
+    def is_hovered(self, pos):
+        dx = pos[0] - self.x
+        dy = pos[1] - self.y
+        return dx**2 + dy**2 <= self.radius**2
+
+    def is_clicked(self, event):
+        return event.type == pygame.MOUSEBUTTONDOWN and self.is_hovered(event.pos)
+
+# ==============================================
+#            START OF PROFILER OVERLAY
+# ==============================================
+
+class ProfilerOverlay(Widget):
+    """
+    Hidden until toggle(). Shows FPS, a histogram of frame-to-frame times,
+    where the frame went (the "events", "update", "draw" and "flip" probes)
+    and stepper timing error. Repaints at most every `refresh` seconds so it
+    doesn't turn every frame into a full redraw.
+    """
+
+    PHASES = ("events", "update", "draw", "flip")
+    # Histogram bucket edges in ms; the last bucket takes everything slower
+    BUCKETS = (5, 10, 15, 20, 25, 30, 35, 40, 50, 66, 100)
+
+    def __init__(self, rect, instruments, stepper, refresh=0.25, text_font="monospace", text_size=14):
+        super().__init__()
+        self.rect = pygame.Rect(rect)
+        self.instruments = instruments
+        self.stepper = stepper
+        self.refresh = refresh
+        self.font = pygame.font.SysFont(text_font, text_size)
+        self.line_height = self.font.get_linesize()
+        self.visible = False
+
+    def toggle(self):
+        self.visible = not self.visible
+
+    def visual_state(self):
+        if not self.visible:
+            return False
+        return int(time.perf_counter() / self.refresh)
+
+    def _line(self, panel, y, text, color=WHITE):
+        # Straight font.render: these strings change every refresh and would only churn the text cache
+        panel.blit(self.font.render(text, True, color), (6, y))
+        return y + self.line_height
+
+    def draw(self, surface):
+        if not self.visible:
+            return pygame.Rect(self.rect.topleft, (0, 0))
+
+        panel = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 190))
+
+        frames = self.instruments.probe("frame").recent(120)
+        fps = len(frames) / sum(frames) if frames and sum(frames) > 0 else 0.0
+        frame = self.instruments.probe("frame").stats()
+        y = self._line(panel, 4, "FPS {:5.1f}  frame p95 {:5.1f} max {:5.1f} ms".format(fps, frame["p95_ms"], frame["max_ms"]))
+
+        phases = [(name, self.instruments.probe(name).stats()["mean_ms"]) for name in self.PHASES]
+        y = self._line(panel, y, "  ".join("{} {:.2f}".format(name, ms) for name, ms in phases[:2]))
+        y = self._line(panel, y, "  ".join("{} {:.2f}".format(name, ms) for name, ms in phases[2:]) + "  ms")
+
+        status = self.stepper.status()
+        late = self.instruments.probe("stepper_late")
+        if late.count:
+            late_stats = late.stats()
+            text = "step late p95 {:.2f} max {:.2f} ms".format(late_stats["p95_ms"], late_stats["max_ms"])
+        else:
+            text = "step late avg {:.2f} max {:.2f} ms".format(status["late_avg_ms"], status["late_max_ms"])
+        y = self._line(panel, y, text + "  " + status["state"], (255, 120, 120) if status["state"] == "fault" else WHITE)
+
+        self._histogram(panel, pygame.Rect(6, y + 4, self.rect.width - 12, self.rect.height - y - 10), frames)
+        return surface.blit(panel, self.rect)
+
+    def _histogram(self, panel, area, frames):
+        counts = [0] * (len(self.BUCKETS) + 1)
+        for seconds in frames:
+            ms = 1000 * seconds
+            for i, edge in enumerate(self.BUCKETS):
+                if ms < edge:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+
+        peak = max(counts) or 1
+        width = area.width // len(counts)
+        for i, count in enumerate(counts):
+            height = int((area.height - self.line_height) * count / peak)
+            # Green within a 30 fps budget, amber up to 15 fps, red beyond
+            edge = self.BUCKETS[i] if i < len(self.BUCKETS) else 1000
+            color = (60, 200, 90) if edge <= 35 else (230, 180, 40) if edge <= 66 else (230, 60, 60)
+            bar = pygame.Rect(area.x + i * width, area.bottom - self.line_height - height, width - 2, height)
+            pygame.draw.rect(panel, color, bar)
+        panel.blit(self.font.render("0", True, GRAY), (area.x, area.bottom - self.line_height))
+        label = self.font.render("{}+ ms".format(self.BUCKETS[-1]), True, GRAY)
+        panel.blit(label, (area.right - label.get_width(), area.bottom - self.line_height))